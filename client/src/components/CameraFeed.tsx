@@ -6,8 +6,16 @@ interface CameraFeedProps {
   socket: Socket | null;
 }
 
+// Stream IDs are "cam<device index>"; label them from 1 like the UI always has
+const cameraLabel = (camera: string) => {
+  const index = Number(camera.replace(/^cam/, ""));
+  return Number.isNaN(index) ? camera : `Camera ${index + 1}`;
+};
+
 const CameraFeed = ({ socket }: CameraFeedProps) => {
-  const imageRef = useRef<HTMLImageElement>(null);
+  // Latest frame per camera; blob URLs are tracked separately so they can be revoked
+  const [frames, setFrames] = useState<Record<string, string>>({});
+  const frameUrlsRef = useRef<Record<string, string>>({});
   const [isFireDetected, setIsFireDetected] = useState(false);
   const [fireConfidence, setFireConfidence] = useState(0);
 
@@ -15,13 +23,27 @@ const CameraFeed = ({ socket }: CameraFeedProps) => {
     if (!socket) return;
 
     const handleFrame = (data: {
-      frame: string;
+      // base64 string, or raw JPEG bytes when the server runs with CAMERA_FRAME_FORMAT=binary
+      frame: string | ArrayBuffer;
+      // Stream ID of the camera; older servers with a single camera omit it
+      camera?: string;
       fire_detected: boolean;
       fire_confidence: number;
     }) => {
-      if (imageRef.current) {
-        imageRef.current.src = `data:image/jpeg;base64,${data.frame}`;
+      const camera = data.camera ?? "cam0";
+      const previousUrl = frameUrlsRef.current[camera];
+      if (previousUrl) {
+        URL.revokeObjectURL(previousUrl);
+        delete frameUrlsRef.current[camera];
+      }
+      let src: string;
+      if (typeof data.frame === "string") {
+        src = `data:image/jpeg;base64,${data.frame}`;
+      } else {
+        src = URL.createObjectURL(new Blob([data.frame], { type: "image/jpeg" }));
+        frameUrlsRef.current[camera] = src;
       }
+      setFrames((current) => ({ ...current, [camera]: src }));
       setIsFireDetected(data.fire_detected);
       setFireConfidence(data.fire_confidence);
     };
@@ -30,9 +52,14 @@ const CameraFeed = ({ socket }: CameraFeedProps) => {
 
     return () => {
       socket.off("camera_frame", handleFrame);
+      Object.values(frameUrlsRef.current).forEach((url) => URL.revokeObjectURL(url));
+      frameUrlsRef.current = {};
     };
   }, [socket]);
 
+  const cameras = Object.keys(frames).sort();
+  if (cameras.length === 0) cameras.push("cam0");
+
   return (
     <div className="relative bg-gray-900 rounded-xl overflow-hidden shadow-lg border border-gray-800">
       {isFireDetected && (
@@ -46,22 +73,26 @@ const CameraFeed = ({ socket }: CameraFeedProps) => {
         </div>
       )}
 
-      <div className="aspect-video relative">
-        <img
-          ref={imageRef}
-          className="absolute inset-0 w-full h-full object-contain"
-          alt="Camera Feed"
-        />
-        <div className="absolute top-4 left-4 flex items-center gap-4">
-          <div className="flex items-center gap-2 bg-black/50 backdrop-blur-sm px-3 py-1.5 rounded-full">
-            <div className="h-2 w-2 bg-red-500 rounded-full animate-pulse"></div>
-            <span className="text-white text-sm font-medium">Live</span>
-          </div>
-          <div className="flex items-center gap-2 bg-black/50 backdrop-blur-sm px-3 py-1.5 rounded-full">
-            <Camera size={16} className="text-white" />
-            <span className="text-white text-sm font-medium">Camera 1</span>
+      <div className={cameras.length > 1 ? "grid grid-cols-1 md:grid-cols-2 gap-1" : ""}>
+        {cameras.map((camera) => (
+          <div key={camera} className="aspect-video relative">
+            <img
+              src={frames[camera]}
+              className="absolute inset-0 w-full h-full object-contain"
+              alt={`${cameraLabel(camera)} Feed`}
+            />
+            <div className="absolute top-4 left-4 flex items-center gap-4">
+              <div className="flex items-center gap-2 bg-black/50 backdrop-blur-sm px-3 py-1.5 rounded-full">
+                <div className="h-2 w-2 bg-red-500 rounded-full animate-pulse"></div>
+                <span className="text-white text-sm font-medium">Live</span>
+              </div>
+              <div className="flex items-center gap-2 bg-black/50 backdrop-blur-sm px-3 py-1.5 rounded-full">
+                <Camera size={16} className="text-white" />
+                <span className="text-white text-sm font-medium">{cameraLabel(camera)}</span>
+              </div>
+            </div>
           </div>
-        </div>
+        ))}
       </div>
     </div>
   );
@@ -1,107 +1,235 @@
+# Select the async worker before anything imports threading or sockets
+from modules import server_mode
+async_mode = server_mode.setup()
+
+# Start the clock for startup timings as early as possible
+from modules.startup import StartupTracker, UNAVAILABLE
+startup = StartupTracker()
+
 import logging
-from logging.handlers import RotatingFileHandler
-import os
-from flask import Flask
-from flask_socketio import SocketIO
+from flask import Flask, Response, jsonify, request
+from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask_cors import CORS
-from modules.camera import CameraHandler
 from modules.gpio_handler import GPIOHandler
 from modules.alarm_handler import AlarmHandler
 from modules.data_handler import DataHandler
+from modules.subscriptions import SubscriptionManager, RATE_TIERS, room_name
+from modules.emit_queue import EmitQueue
+from modules.event_bus import ALARM_PRIORITY, EventBus
+from modules.log_config import configure_logging
+from modules.metrics import REGISTRY, register_process_metrics
+from modules.scheduler import Scheduler
 
-# Create logs directory if it doesn't exist
-os.makedirs('logs', exist_ok=True)
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        RotatingFileHandler(
-            'logs/smoke_detector.log',
-            maxBytes=1024*1024,  # 1MB
-            backupCount=5
-        ),
-        logging.StreamHandler()
-    ]
-)
+# Configure logging; file and console output happen on a listener thread.
+# Levels can be set per module, e.g. LOG_LEVELS=modules.camera=DEBUG
+log_listener = configure_logging('logs/smoke_detector.log')
 
 # Get logger for this file
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app)
-socketio = SocketIO(app, cors_allowed_origins="*")
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=async_mode)
+
+logger.info("Initializing application components (%s mode, %s worker)...", server_mode.SERVER_MODE, async_mode)
 
-logger.info("Initializing application components...")
+for component in ('event_bus', 'scheduler', 'alarm', 'smoke_detection', 'data'):
+    startup.register(component)
+startup.register('camera', required=False)
 
-# Initialize handlers
+# Stage 1: everything the alarm path needs, started synchronously.
+# The camera (and OpenCV) load in the background afterwards.
+camera_handler = None
 try:
-    camera_handler = CameraHandler(fps=5)
-    logger.info("Camera handler initialized")
-    
-    alarm_handler = AlarmHandler()
+    event_bus = startup.run('event_bus', EventBus)
+    event_bus.start(socketio)
+    logger.info("Event bus initialized")
+
+    # Runs the periodic detection, camera and data collection jobs
+    scheduler = startup.run('scheduler', Scheduler, workers=2)
+    scheduler.start(socketio)
+    logger.info("Scheduler initialized")
+
+    alarm_handler = startup.run('alarm', AlarmHandler, event_bus=event_bus)
     logger.info("Alarm handler initialized")
     
-    gpio_handler = GPIOHandler(alarm_handler=alarm_handler)
+    gpio_handler = GPIOHandler(event_bus=event_bus)
     logger.info("GPIO handler initialized")
     
-    data_handler = DataHandler(gpio_handler, alarm_handler, interval=1.0)
+    data_handler = startup.run('data', DataHandler, gpio_handler, alarm_handler, event_bus, interval=1.0)
     logger.info("Data handler initialized")
+
+    subscriptions = SubscriptionManager()
+    logger.info("Subscription manager initialized")
+
+    emit_queue = EmitQueue(socketio)
+    logger.info("Emit queue initialized")
+
+    REGISTRY.gauge('socketio_connected_clients', 'Connected Socket.IO clients',
+                   func=subscriptions.client_count)
+    register_process_metrics()
 except Exception as e:
-    logger.error(f"Error during component initialization: {str(e)}")
+    logger.error("Error during component initialization: %s", e)
     logger.exception("Initialization error details:")
     raise
 
-def handle_smoke_detection(is_smoke_detected):
-    """Callback for smoke detection events"""
+@app.route('/healthz')
+def healthz():
+    """Liveness: the server answers, with per-component startup state"""
+    return jsonify(startup.get_status())
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: 200 once the alarm path is up, 503 before that"""
+    status = startup.get_status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text exposition of all counters and histograms"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+def get_full_status():
+    """Merged detector and alarm status as sent to clients"""
+    status = {
+        **gpio_handler.get_status(),
+        **alarm_handler.get_status()
+    }
+    if camera_handler is not None:
+        status['camera'] = camera_handler.get_status()
+    return status
+
+def emit_status(event, status):
+    """Emit a status event to every status channel subscriber
+
+    Status updates are event-driven, so they go to all status rooms
+    regardless of rate tier to avoid dropping a state change.
+    """
+    for tier in subscriptions.active_tiers('status'):
+        emit_queue.put('status', event, status, to=room_name('status', tier))
+
+def handle_smoke_detection(event):
+    """Drive the alarm from smoke_state events"""
     try:
-        if is_smoke_detected:
-            logger.warning("Smoke detected! Activating alarm...")
-            alarm_handler.activate()
+        # Actuate before logging; the event timestamp marks the decision
+        if event.data['smoke_detected']:
+            alarm_handler.activate(decided_at=event.timestamp)
+            logger.warning("Smoke detected! Alarm activation requested", extra={'rate_limit': False})
         else:
-            logger.info("Smoke cleared. Deactivating alarm...")
-            alarm_handler.deactivate()
-        
-        # Emit status update
-        status = {
-            **gpio_handler.get_status(),
-            **alarm_handler.get_status()
-        }
-        socketio.emit('status_update', status)
-        logger.debug(f"Emitted status update: {status}")
+            alarm_handler.deactivate(decided_at=event.timestamp)
+            logger.info("Smoke cleared. Alarm deactivation requested", extra={'rate_limit': False})
     except Exception as e:
-        logger.error(f"Error in smoke detection handler: {str(e)}")
+        logger.error("Error in smoke detection handler: %s", e)
+
+def handle_state_change(event):
+    """Push smoke and alarm state changes to status subscribers"""
+    try:
+        status = get_full_status()
+        emit_status('status_update', status)
+        logger.debug("Emitted status update after %s: %s", event.type, status, extra={'rate_limit': True})
+    except Exception as e:
+        logger.error("Error emitting status update: %s", e)
+
+# The alarm runs ahead of every other smoke_state subscriber (the data
+# recorder, status pushes, camera priorities) so it is actuated first
+event_bus.subscribe('smoke_state', handle_smoke_detection, priority=ALARM_PRIORITY)
+event_bus.subscribe('smoke_state', handle_state_change)
+event_bus.subscribe('alarm_state', handle_state_change)
+
+# Smoke detection runs from startup, independent of connected clients
+startup.run('smoke_detection', gpio_handler.start_detection, scheduler)
+
+def load_camera():
+    """Import OpenCV and probe for a camera; runs off the startup path"""
+    from modules.camera import CameraHandler
+    return CameraHandler(fps=5, event_bus=event_bus, socketio=socketio)
+
+def start_camera_in_background():
+    """Stage 2: load the camera, then start it if clients are already waiting"""
+    global camera_handler
+    try:
+        handler = startup.run('camera', server_mode.run_blocking, load_camera)
+    except Exception:
+        logger.exception("Camera initialization error details:")
+        return
+    if not handler.camera_available:
+        startup.mark('camera', UNAVAILABLE, 'No camera found')
+    elif len(handler.streams) > 1:
+        # The default workers cover one blocking camera read; add one per extra camera
+        scheduler.add_workers(len(handler.streams) - 1)
+    camera_handler = handler
+    logger.info("Camera handler initialized")
+    if subscriptions.client_count() > 0:
+        camera_handler.start(scheduler, emit_queue, subscriptions)
+
+socketio.start_background_task(start_camera_in_background)
 
 @socketio.on('connect')
 def handle_connect():
-    logger.info("Client connected")
+    logger.info("Client connected: %s", request.sid)
     try:
-        camera_handler.start(socketio)
-        data_handler.start(socketio)
-        gpio_handler.start_detection()
+        # Clients may pick channels on connect, e.g. ?channels=camera:thumbnail,status
+        subscriptions.add_client(request.sid)
+        requested = subscriptions.parse_channels(request.args.get('channels'))
+        for channel, tier in requested.items():
+            room, _ = subscriptions.subscribe(request.sid, channel, tier)
+            join_room(room)
+
+        emit_queue.start()
+        data_handler.start(scheduler, emit_queue, subscriptions)
+        # The camera may still be loading; it starts itself once ready
+        if camera_handler is not None:
+            camera_handler.start(scheduler, emit_queue, subscriptions)
         
-        # Send initial status
-        status = {
-            **gpio_handler.get_status(),
-            **alarm_handler.get_status()
-        }
-        socketio.emit('status_update', status)
-        socketio.emit('full_dataset', data_handler.get_current_data())
+        # Send initial status and dataset to this client only
+        if 'status' in requested:
+            emit('status_update', get_full_status())
+        if 'data' in requested:
+            emit('full_dataset', data_handler.get_current_data())
         logger.debug("Sent initial status and dataset to client")
     except Exception as e:
-        logger.error(f"Error during client connection handling: {str(e)}")
+        logger.error("Error during client connection handling: %s", e)
 
 @socketio.on('disconnect')
 def handle_disconnect():
-    logger.info("Client disconnected")
+    logger.info("Client disconnected: %s", request.sid)
+    try:
+        subscriptions.remove_client(request.sid)
+
+        # Keep streaming while other clients are still connected.
+        # Smoke detection keeps running regardless.
+        if subscriptions.client_count() == 0:
+            if camera_handler is not None:
+                camera_handler.stop()
+            data_handler.stop()
+            logger.info("Streaming handlers stopped successfully")
+    except Exception as e:
+        logger.error("Error during disconnect handling: %s", e)
+
+@socketio.on('subscribe')
+def handle_subscribe(data):
+    """Subscribe the client to a channel, e.g. {'channel': 'camera', 'tier': 'thumbnail'}"""
+    try:
+        room, old_room = subscriptions.subscribe(request.sid, data.get('channel'),
+                                                 data.get('tier', 'full'))
+        if old_room:
+            leave_room(old_room)
+        join_room(room)
+        emit('subscriptions', subscriptions.client_subscriptions(request.sid))
+    except Exception as e:
+        logger.error("Error subscribing client: %s", e)
+        emit('subscription_error', {'error': str(e), 'tiers': list(RATE_TIERS)})
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe(data):
+    """Unsubscribe the client from a channel, e.g. {'channel': 'camera'}"""
     try:
-        camera_handler.stop()
-        data_handler.stop()
-        gpio_handler.stop_detection()
-        logger.info("All handlers stopped successfully")
+        room = subscriptions.unsubscribe(request.sid, data.get('channel'))
+        if room:
+            leave_room(room)
+        emit('subscriptions', subscriptions.client_subscriptions(request.sid))
     except Exception as e:
-        logger.error(f"Error during disconnect handling: {str(e)}")
+        logger.error("Error unsubscribing client: %s", e)
 
 @socketio.on('toggle_alarm')
 def handle_toggle_alarm():
@@ -109,38 +237,45 @@ def handle_toggle_alarm():
         logger.info("Received alarm toggle request")
         enabled = alarm_handler.toggle_enable()
         status = {'alarm_enabled': enabled}  # Match the frontend property name
-        logger.info(f"Alarm toggled - new state: {status}")
-        socketio.emit('alarm_status', status)
-        
-        # Also emit a full status update
-        full_status = {
-            **gpio_handler.get_status(),
-            **alarm_handler.get_status()
-        }
-        logger.info(f"Emitting full status update: {full_status}")
-        socketio.emit('status_update', full_status)
+        logger.info("Alarm toggled - new state: %s", status)
+        emit_status('alarm_status', status)
+        # The full status update follows from the alarm_state event
     except Exception as e:
-        logger.error(f"Error toggling alarm: {str(e)}")
+        logger.error("Error toggling alarm: %s", e)
 
         
+@socketio.on('set_alarm_pattern')
+def handle_set_alarm_pattern(data):
+    """Change the siren pattern, e.g. {'pattern': 'pulse'}"""
+    try:
+        alarm_handler.set_pattern(data.get('pattern'))
+        emit_status('status_update', get_full_status())
+    except Exception as e:
+        logger.error("Error setting alarm pattern: %s", e)
+        emit('alarm_error', {'error': str(e)})
+
 @socketio.on('get_status')
 def handle_get_status():
     try:
-        status = {
-            **gpio_handler.get_status(),
-            **alarm_handler.get_status()
-        }
-        socketio.emit('status_update', status)
-        logger.debug(f"Status request fulfilled: {status}")
+        status = get_full_status()
+        emit('status_update', status)
+        logger.debug("Status request fulfilled: %s", status)
     except Exception as e:
-        logger.error(f"Error getting status: {str(e)}")
+        logger.error("Error getting status: %s", e)
 
 if __name__ == '__main__':
     logger.info("Starting smoke detector application...")
     try:
-        socketio.run(app, host='0.0.0.0', port=5000, debug=True)
+        # No reloader in either mode: it runs this module in a second process,
+        # which would start its own smoke detection and drive the alarm pin
+        # alongside the serving process
+        if server_mode.is_production():
+            socketio.run(app, host='0.0.0.0', port=server_mode.PORT, debug=False, use_reloader=False,
+                         log_output=False, allow_unsafe_werkzeug=async_mode == 'threading')
+        else:
+            socketio.run(app, host='0.0.0.0', port=server_mode.PORT, debug=True, use_reloader=False)
     except Exception as e:
-        logger.error(f"Error during application runtime: {str(e)}")
+        logger.error("Error during application runtime: %s", e)
         logger.exception("Runtime error details:")
     finally:
         logger.info("Cleaning up resources...")
@@ -148,6 +283,9 @@ if __name__ == '__main__':
             gpio_handler.cleanup()
             alarm_handler.cleanup()
             data_handler.stop()
+            emit_queue.stop()
+            event_bus.stop()
+            scheduler.stop()
             logger.info("Cleanup completed successfully")
         except Exception as e:
-            logger.error(f"Error during cleanup: {str(e)}")
\ No newline at end of file
+            logger.error("Error during cleanup: %s", e)
\ No newline at end of file
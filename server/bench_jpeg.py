@@ -0,0 +1,144 @@
+"""
+Microbenchmark for the JPEG encoder backends and the parallel encode pool
+
+Encodes the same frame with every backend that loads on this machine, in
+every color mode it supports, at the stream's full and thumbnail
+resolutions, then measures pool throughput with 1..N workers using the fastest backend.
+Times include converting the BGR test frame to each color mode, which a
+camera delivering gray or YUV frames natively would not need.
+
+    python bench_jpeg.py
+    python bench_jpeg.py --image snapshot.jpg --resolutions 1280x720,640x480 --iterations 200
+"""
+import argparse
+import os
+import time
+from statistics import mean, median
+
+import cv2
+import numpy as np
+from flask import Flask
+from flask_socketio import SocketIO
+
+from modules.encode_pool import EncodePool
+from modules.jpeg_encoder import ENCODERS, available_encoders, convert_color
+from modules.subscriptions import RATE_TIERS
+
+
+def make_frame(width, height, image_path=None):
+    """A camera-like test frame: a real image if given, else gradients, shapes and sensor noise"""
+    if image_path:
+        frame = cv2.imread(image_path)
+        if frame is None:
+            raise SystemExit(f"Cannot read {image_path}")
+        return cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    frame = np.stack([np.broadcast_to(x, (height, width)),
+                      np.broadcast_to(y, (height, width)),
+                      (x + y) / 2], axis=2)
+    frame = frame.astype(np.uint8).copy()
+    for _ in range(12):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        cv2.circle(frame, center, int(rng.integers(5, max(6, width // 6))), color, -1)
+    noise = rng.normal(0, 6, frame.shape)
+    return np.clip(frame + noise, 0, 255).astype(np.uint8)
+
+
+def time_encoder(encoder, frame, color_mode, quality, iterations):
+    """Per-frame times in ms for color conversion plus encoding, and the output size"""
+    times = []
+    size = 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        image = convert_color(frame, color_mode)
+        buffer = encoder.encode(image, quality, color_mode)
+        times.append((time.perf_counter() - start) * 1000)
+        size = len(buffer)
+    return times, size
+
+
+def bench_backends(backends, resolutions, iterations, image_path):
+    print(f"{'backend':<11} {'mode':<7} {'resolution':<10} {'mean ms':>8} {'p50 ms':>8} {'fps':>8} {'KB':>7}")
+    fastest = {}
+    for width, height in resolutions:
+        frame = make_frame(width, height, image_path)
+        quality = RATE_TIERS['full']['jpeg_quality']
+        for name in backends:
+            encoder = ENCODERS[name]()
+            for color_mode in encoder.color_modes:
+                time_encoder(encoder, frame, color_mode, quality, 3)  # Warm up
+                times, size = time_encoder(encoder, frame, color_mode, quality, iterations)
+                print(f"{name:<11} {color_mode:<7} {width}x{height:<5} {mean(times):8.3f} {median(times):8.3f} "
+                      f"{1000 / mean(times):8.1f} {size / 1024:7.1f}")
+                if color_mode == 'bgr' and mean(times) < fastest.get((width, height), (None, float('inf')))[1]:
+                    fastest[(width, height)] = (name, mean(times))
+        print()
+    return fastest
+
+
+def bench_pool(backend, width, height, frames, max_workers, image_path):
+    """Frames per second through EncodePool with 1..max_workers workers"""
+    socketio = SocketIO(Flask(__name__), async_mode='threading')
+    encoder = ENCODERS[backend]()
+    frame = make_frame(width, height, image_path)
+    quality = RATE_TIERS['full']['jpeg_quality']
+
+    print(f"Encode pool, {backend}, {width}x{height}, {frames} frames")
+    for workers in range(1, max_workers + 1):
+        results = []
+        pool = EncodePool(lambda image: encoder.encode(image, quality), workers=workers, max_pending=frames)
+        pool.start(socketio)
+        start = time.perf_counter()
+        for sequence in range(frames):
+            pool.submit(lambda result, duration, sequence=sequence: results.append(sequence), frame)
+        while len(results) < frames:
+            time.sleep(0.001)
+        elapsed = time.perf_counter() - start
+        pool.stop()
+        in_order = results == sorted(results)
+        print(f"  {workers} workers: {frames / elapsed:8.1f} fps, in order: {in_order}")
+
+
+def parse_resolutions(spec):
+    resolutions = []
+    for item in spec.split(','):
+        width, _, height = item.strip().partition('x')
+        resolutions.append((int(width), int(height)))
+    return resolutions
+
+
+def main():
+    # The stream captures at 640x480; thumbnails are scaled by the thumbnail tier
+    scale = RATE_TIERS['thumbnail']['scale']
+    default_resolutions = f"640x480,{int(640 * scale)}x{int(480 * scale)},1280x720"
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--resolutions', default=default_resolutions,
+                        help=f"Comma separated WIDTHxHEIGHT list (default {default_resolutions})")
+    parser.add_argument('--iterations', type=int, default=100, help="Encodes per measurement")
+    parser.add_argument('--backends', default=None,
+                        help=f"Comma separated subset of {', '.join(ENCODERS)} (default: all that load)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Largest pool size to try")
+    parser.add_argument('--image', default=None, help="Encode this image instead of a synthetic frame")
+    args = parser.parse_args()
+
+    available = available_encoders()
+    backends = args.backends.split(',') if args.backends else available
+    missing = [name for name in backends if name not in available]
+    if missing:
+        raise SystemExit(f"Not available here: {', '.join(missing)} (available: {', '.join(available)})")
+    print(f"Backends: {', '.join(backends)}; unavailable: {', '.join(set(ENCODERS) - set(available)) or 'none'}")
+    print(f"Cores: {os.cpu_count()}, OpenCV {cv2.__version__}\n")
+
+    resolutions = parse_resolutions(args.resolutions)
+    fastest = bench_backends(backends, resolutions, args.iterations, args.image)
+    width, height = resolutions[0]
+    bench_pool(fastest[(width, height)][0], width, height, args.iterations, args.workers, args.image)
+
+
+if __name__ == '__main__':
+    main()
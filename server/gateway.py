@@ -0,0 +1,97 @@
+# Select the async worker before anything imports threading or sockets
+from modules import server_mode
+async_mode = server_mode.setup()
+
+# Start the clock for startup timings as early as possible
+from modules.startup import StartupTracker
+startup = StartupTracker()
+
+import logging
+import os
+from flask import Flask, Response, jsonify
+from flask_socketio import SocketIO, emit
+from flask_cors import CORS
+from modules.emit_queue import EmitQueue
+from modules.gateway import Gateway, parse_nodes
+from modules.log_config import configure_logging
+from modules.metrics import REGISTRY, register_process_metrics
+
+# Gateway mode: aggregate several detector nodes, each running app.py, e.g.
+# GATEWAY_NODES=kitchen=http://10.0.0.5:5000,garage=http://10.0.0.6:5000
+log_listener = configure_logging('logs/gateway.log')
+
+# Get logger for this file
+logger = logging.getLogger(__name__)
+
+app = Flask(__name__)
+CORS(app)
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=async_mode)
+
+logger.info("Initializing gateway (%s mode, %s worker)...", server_mode.SERVER_MODE, async_mode)
+
+startup.register('gateway')
+try:
+    nodes = parse_nodes(os.environ.get('GATEWAY_NODES'))
+    if not nodes:
+        raise ValueError("GATEWAY_NODES is empty, expected e.g. kitchen=http://10.0.0.5:5000")
+
+    register_process_metrics()
+
+    emit_queue = EmitQueue(socketio)
+    emit_queue.start()
+    logger.info("Emit queue initialized")
+
+    gateway = startup.run('gateway', Gateway, socketio, emit_queue, nodes, startup=startup)
+    gateway.start()
+except Exception as e:
+    logger.error("Error during gateway initialization: %s", e)
+    logger.exception("Initialization error details:")
+    raise
+
+@app.route('/healthz')
+def healthz():
+    """Liveness, with per-node connection state"""
+    return jsonify(startup.get_status())
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: 200 once the gateway is serving, even if some nodes are down"""
+    status = startup.get_status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text exposition of all counters and histograms"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/nodes')
+def nodes_status():
+    """Per-node connection, cache and downstream subscription state"""
+    return jsonify(gateway.get_status())
+
+@socketio.on('connect')
+def handle_connect():
+    # The default namespace only lists nodes; data lives on /nodes/<name>
+    emit('nodes', gateway.get_nodes())
+
+@socketio.on('get_nodes')
+def handle_get_nodes():
+    emit('nodes', gateway.get_nodes())
+
+if __name__ == '__main__':
+    logger.info("Starting gateway...")
+    try:
+        # No reloader: it would open a second set of upstream connections
+        socketio.run(app, host='0.0.0.0', port=server_mode.PORT, debug=not server_mode.is_production(),
+                     use_reloader=False, log_output=False, allow_unsafe_werkzeug=async_mode == 'threading')
+    except Exception as e:
+        logger.error("Error during gateway runtime: %s", e)
+        logger.exception("Runtime error details:")
+    finally:
+        logger.info("Cleaning up resources...")
+        try:
+            gateway.stop()
+            emit_queue.stop()
+            logger.info("Cleanup completed successfully")
+        except Exception as e:
+            logger.error("Error during cleanup: %s", e)
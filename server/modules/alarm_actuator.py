@@ -0,0 +1,188 @@
+import os
+import time
+from collections import deque
+from modules.metrics import REGISTRY
+from modules.server_mode import native_thread_api
+
+try:
+    import RPi.GPIO as GPIO
+except ImportError:
+    from modules.mock_gpio import GPIO
+
+# Siren patterns as (on_seconds, off_seconds); None keeps the pin high
+SIREN_PATTERNS = {
+    'steady': None,
+    'pulse': (0.5, 0.5),
+    'chirp': (0.1, 0.9),
+}
+
+
+class AlarmActuator:
+    def __init__(self, alarm_pin: int, pattern: str = 'steady'):
+        """
+        Drive the alarm pin from a dedicated native thread
+
+        Commands are appended to a deque (atomic in CPython, so no lock) and
+        the thread is woken through a raw lock used as a binary semaphore.
+        The thread does no logging or formatting so pin writes are not
+        delayed; problems are reported through get_status().
+
+        Args:
+            alarm_pin (int): GPIO pin number for alarm output, already set up
+            pattern (str): Siren pattern name from SIREN_PATTERNS
+        """
+        if pattern not in SIREN_PATTERNS:
+            raise ValueError(f"Unknown siren pattern '{pattern}'")
+        self.alarm_pin = alarm_pin
+        self.pattern = pattern
+        self.commands = deque()
+        self.desired_active = False
+        self.pin_high = False
+        self.is_running = False
+
+        # Decision-to-pin-write latency of activate/deactivate commands
+        self.latency = REGISTRY.histogram(
+            'alarm_actuation_latency_seconds', 'Time from smoke decision to alarm pin write')
+        self.writes = 0
+        self.errors = 0
+        self.last_error = None
+        self.priority = 'normal'
+
+        self._start_new_thread, allocate_lock = native_thread_api()
+        self._wake = allocate_lock()
+        self._wake.acquire()
+        self._stopped = allocate_lock()
+
+    def start(self):
+        """Start the actuator thread"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self._stopped.acquire()
+        self._start_new_thread(self._run, ())
+
+    def stop(self, timeout: float = 2.0):
+        """Drive the pin low and stop the actuator thread"""
+        if not self.is_running:
+            return
+        self._push('stop', None, time.monotonic())
+        if self._stopped.acquire(timeout=timeout):
+            self._stopped.release()
+        self.is_running = False
+
+    def activate(self, decided_at: float = None) -> bool:
+        """
+        Request the alarm on; a no-op if it already is
+
+        Args:
+            decided_at (float): time.monotonic() of the triggering decision,
+                used for the latency histogram. Defaults to now.
+
+        Returns:
+            True if a command was queued
+        """
+        if self.desired_active:
+            return False
+        self.desired_active = True
+        self._push('activate', None, decided_at)
+        return True
+
+    def deactivate(self, decided_at: float = None) -> bool:
+        """Request the alarm off; a no-op if it already is"""
+        if not self.desired_active:
+            return False
+        self.desired_active = False
+        self._push('deactivate', None, decided_at)
+        return True
+
+    def set_pattern(self, pattern: str):
+        """Switch siren pattern; takes effect immediately if the alarm is on"""
+        if pattern not in SIREN_PATTERNS:
+            raise ValueError(f"Unknown siren pattern '{pattern}'")
+        self.pattern = pattern
+        self._push('pattern', pattern, None)
+
+    def _push(self, command, argument, decided_at):
+        self.commands.append((command, argument,
+                              time.monotonic() if decided_at is None else decided_at))
+        try:
+            self._wake.release()
+        except RuntimeError:
+            pass  # Already signalled
+
+    def _raise_priority(self) -> str:
+        """Try real-time scheduling, then a negative nice value, for this thread"""
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(50))
+            return 'SCHED_FIFO'
+        except (AttributeError, OSError):
+            pass
+        try:
+            os.setpriority(os.PRIO_PROCESS, 0, -10)
+            return 'nice -10'
+        except (AttributeError, OSError):
+            return 'normal'
+
+    def _write(self, high: bool, decided_at: float = None):
+        try:
+            GPIO.output(self.alarm_pin, GPIO.HIGH if high else GPIO.LOW)
+            self.pin_high = high
+            self.writes += 1
+            if decided_at is not None:
+                self.latency.observe(time.monotonic() - decided_at)
+        except Exception as e:
+            self.errors += 1
+            self.last_error = str(e)
+
+    def _run(self):
+        self.priority = self._raise_priority()
+        active = False
+        next_toggle = None
+        try:
+            while True:
+                timeout = -1 if next_toggle is None else max(0.0, next_toggle - time.monotonic())
+                self._wake.acquire(timeout=timeout)
+
+                while self.commands:
+                    command, argument, decided_at = self.commands.popleft()
+                    if command == 'stop':
+                        self._write(False)
+                        return
+                    if command == 'activate':
+                        if active:
+                            continue
+                        active = True
+                    elif command == 'deactivate':
+                        if not active:
+                            continue
+                        active = False
+                    elif not active:
+                        continue  # Pattern change while silent
+
+                    # (Re)start the pattern from its "on" phase
+                    timing = SIREN_PATTERNS[self.pattern]
+                    self._write(active, decided_at if command != 'pattern' else None)
+                    next_toggle = time.monotonic() + timing[0] if active and timing else None
+
+                # Advance the siren pattern
+                if next_toggle is not None and time.monotonic() >= next_toggle:
+                    timing = SIREN_PATTERNS[self.pattern]
+                    if not active or timing is None:
+                        next_toggle = None
+                        continue
+                    self._write(not self.pin_high)
+                    next_toggle = time.monotonic() + (timing[0] if self.pin_high else timing[1])
+        finally:
+            self._stopped.release()
+
+    def get_status(self):
+        """Get actuator state and decision-to-pin-write latency"""
+        return {
+            'pattern': self.pattern,
+            'pin_high': self.pin_high,
+            'priority': self.priority,
+            'writes': self.writes,
+            'errors': self.errors,
+            'last_error': self.last_error,
+            'latency': self.latency.get_status()
+        }
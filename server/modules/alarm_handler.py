@@ -1,5 +1,7 @@
 # modules/alarm_handler.py
 import logging
+from modules.alarm_actuator import AlarmActuator
+from modules.metrics import REGISTRY
 try:
     import RPi.GPIO as GPIO
     GPIO_AVAILABLE = True
@@ -10,28 +12,36 @@ except ImportError:
 
 # Setup module logger
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
 
 class AlarmHandler:
-    def __init__(self, alarm_pin=12):
+    def __init__(self, alarm_pin=12, event_bus=None, pattern='steady'):
         """
         Initialize the alarm handler
         
         Args:
             alarm_pin (int): GPIO pin number for alarm output
+            event_bus: Optional EventBus to publish alarm_state changes on
+            pattern (str): Siren pattern, see alarm_actuator.SIREN_PATTERNS
         """
         self.alarm_pin = alarm_pin
+        self.event_bus = event_bus
+        self.pattern = pattern
+        self.actuator = None
+        self.activations = REGISTRY.counter(
+            'alarm_transitions_total', 'Alarm state transitions', labels={'state': 'active'})
+        self.deactivations = REGISTRY.counter(
+            'alarm_transitions_total', 'Alarm state transitions', labels={'state': 'inactive'})
         self.is_enabled = True
         self.is_active = False
         
         # Log initialization
         if GPIO_AVAILABLE:
             logger.info("Initializing AlarmHandler with real GPIO")
-            logger.info(f"GPIO Version: {GPIO.VERSION}")
+            logger.info("GPIO Version: %s", GPIO.VERSION)
         else:
             logger.warning("Initializing AlarmHandler with mock GPIO")
             
-        logger.info(f"Initializing alarm on pin {alarm_pin}")
+        logger.info("Initializing alarm on pin %s", alarm_pin)
         self.setup_alarm()
 
     def setup_alarm(self):
@@ -41,41 +51,61 @@ class AlarmHandler:
             logger.info("GPIO mode set to BCM")
             
             GPIO.setup(self.alarm_pin, GPIO.OUT)
-            logger.info(f"Successfully configured GPIO pin {self.alarm_pin} as OUTPUT")
+            logger.info("Successfully configured GPIO pin %s as OUTPUT", self.alarm_pin)
             
             # Ensure alarm starts in deactivated state
             GPIO.output(self.alarm_pin, GPIO.LOW)
             logger.info("Alarm initialized in deactivated state")
+
+            # All further pin writes go through the actuator thread
+            self.actuator = AlarmActuator(self.alarm_pin, self.pattern)
+            self.actuator.start()
+            logger.info("Alarm actuator started with %s pattern", self.pattern)
             
         except Exception as e:
-            logger.error(f"Error setting up alarm on GPIO pin {self.alarm_pin}: {str(e)}")
+            logger.error("Error setting up alarm on GPIO pin %s: %s", self.alarm_pin, e)
             logger.exception("Alarm setup error details:")
             raise
 
-    def activate(self):
-        """Activate the alarm if it's enabled"""
+    def activate(self, decided_at=None):
+        """
+        Activate the alarm if it's enabled
+
+        Args:
+            decided_at (float): time.monotonic() of the triggering decision,
+                recorded in the actuator's latency histogram
+        """
         if self.is_enabled:
             try:
-                GPIO.output(self.alarm_pin, GPIO.HIGH)
+                if self.is_active:
+                    return True
+                # Queue the pin write first so logging never delays it
+                self.actuator.activate(decided_at)
                 self.is_active = True
-                logger.warning("🚨 ALARM ACTIVATED 🚨")
+                self.activations.inc()
+                logger.warning("🚨 ALARM ACTIVATED 🚨", extra={'rate_limit': False})
+                self._publish_state()
                 return True
             except Exception as e:
-                logger.error(f"Failed to activate alarm: {str(e)}")
+                logger.error("Failed to activate alarm: %s", e)
                 return False
         else:
             logger.info("Alarm activation prevented - alarm is disabled")
             return False
 
-    def deactivate(self):
+    def deactivate(self, decided_at=None):
         """Deactivate the alarm"""
         try:
-            GPIO.output(self.alarm_pin, GPIO.LOW)
+            if not self.is_active:
+                return True
+            self.actuator.deactivate(decided_at)
             self.is_active = False
-            logger.info("Alarm deactivated")
+            self.deactivations.inc()
+            logger.info("Alarm deactivated", extra={'rate_limit': False})
+            self._publish_state()
             return True
         except Exception as e:
-            logger.error(f"Failed to deactivate alarm: {str(e)}")
+            logger.error("Failed to deactivate alarm: %s", e)
             return False
 
     def toggle_enable(self):
@@ -83,28 +113,45 @@ class AlarmHandler:
         try:
             self.is_enabled = not self.is_enabled
             state_str = "enabled" if self.is_enabled else "disabled"
-            logger.info(f"Alarm system {state_str}")
+            logger.info("Alarm system %s", state_str)
             
             if not self.is_enabled:
                 logger.info("Deactivating alarm due to system disable")
                 self.deactivate()
-                
+
+            self._publish_state()
             return self.is_enabled
         except Exception as e:
-            logger.error(f"Error toggling alarm state: {str(e)}")
+            logger.error("Error toggling alarm state: %s", e)
             return self.is_enabled
 
+    def set_pattern(self, pattern):
+        """Change the siren pattern, raising ValueError for unknown patterns"""
+        self.actuator.set_pattern(pattern)
+        self.pattern = pattern
+        logger.info("Alarm pattern set to %s", pattern)
+
+    def _publish_state(self):
+        """Publish the current alarm state on the event bus, if any"""
+        if self.event_bus is not None:
+            self.event_bus.publish('alarm_state', {
+                'alarm_active': self.is_active,
+                'alarm_enabled': self.is_enabled
+            })
+
     def get_status(self):
         """Get current status of the alarm"""
         try:
             status = {
                 'alarm_active': self.is_active,
-                'alarm_enabled': self.is_enabled
+                'alarm_enabled': self.is_enabled,
+                'alarm_pattern': self.pattern,
+                'alarm_actuator': self.actuator.get_status()
             }
-            logger.debug(f"Current alarm status: {status}")
+            logger.debug("Current alarm status: %s", status, extra={'rate_limit': True})
             return status
         except Exception as e:
-            logger.error(f"Error getting alarm status: {str(e)}")
+            logger.error("Error getting alarm status: %s", e)
             return {
                 'alarm_active': False,
                 'alarm_enabled': False,
@@ -115,9 +162,9 @@ class AlarmHandler:
         """Cleanup GPIO resources"""
         try:
             logger.info("Starting alarm cleanup...")
-            if self.is_active:
-                self.deactivate()
+            self.actuator.stop()
+            self.is_active = False
             GPIO.cleanup([self.alarm_pin])
-            logger.info(f"GPIO cleanup completed for alarm pin {self.alarm_pin}")
+            logger.info("GPIO cleanup completed for alarm pin %s", self.alarm_pin)
         except Exception as e:
-            logger.error(f"Error during alarm cleanup: {str(e)}")
\ No newline at end of file
+            logger.error("Error during alarm cleanup: %s", e)
\ No newline at end of file
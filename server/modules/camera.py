@@ -135,74 +135,406 @@
 
 import cv2
 import base64
-from threading import Thread
+import logging
+import os
+import threading
 import time
+from collections import deque
+from functools import partial
+from typing import Dict, Iterable, Optional
+from modules.encode_pool import EncodePool
+from modules.frame_pool import FrameBufferPool
+from modules.jpeg_encoder import COLOR_MODES, convert_color, converted_shape, create_encoder
+from modules.metrics import REGISTRY
+from modules.server_mode import run_blocking
+from modules.subscriptions import RATE_TIERS, room_name
+
+# Setup module logger
+logger = logging.getLogger(__name__)
+
+# How encoded frames are sent: 'base64' strings, or raw JPEG bytes as
+# Socket.IO binary attachments (no base64 step, a quarter less traffic)
+FRAME_FORMATS = ('base64', 'binary')
+
+# Added to the priority of boosted cameras, e.g. the ones nearest a
+# triggered smoke sensor, so they are encoded before all others
+BOOST_PRIORITY = 100
+
+# Window for the per-camera fps and CPU figures, in seconds
+STATS_WINDOW = 5.0
+
+
+def stream_id(index: int) -> str:
+    """Stream ID for a camera; derived from the device index so it is stable across restarts"""
+    return f"cam{index}"
+
+
+def parse_priorities(spec: Optional[str]) -> Dict[str, int]:
+    """Parse "cam0=2,cam1=1" into stream ID -> encode priority"""
+    priorities = {}
+    for item in (spec or '').split(','):
+        name, _, priority = item.strip().partition('=')
+        if name and priority:
+            priorities[name] = int(priority)
+    return priorities
+
+
+def parse_stream_ids(spec: Optional[str]) -> Iterable[str]:
+    """Parse "cam0,cam2" into a list of stream IDs"""
+    return [item.strip() for item in (spec or '').split(',') if item.strip()]
+
+
+class CameraStream:
+    def __init__(self, handler: 'CameraHandler', index: int, camera):
+        """
+        Capture pipeline for one camera
+
+        Each stream has its own scheduler job, frame buffers and metrics;
+        encoding goes through the handler's shared pool, keyed by stream ID.
+
+        Args:
+            handler (CameraHandler): Owner holding the shared encoder and pool
+            index (int): Device index the camera was opened at
+            camera: Opened cv2.VideoCapture
+        """
+        self.handler = handler
+        self.index = index
+        self.stream_id = stream_id(index)
+        self.camera = camera
+        self.job_name = f"camera:{self.stream_id}"
+        self.lock = threading.Lock()
+        self.frames = 0
+        self.cpu_seconds = 0.0
+        self.samples = deque()  # (time, frames, cpu_seconds), newest last
+
+        # Captures read into reused buffers. Each buffer is held until every
+        # tier's encode is done with it, so size the pool for a full backlog.
+        pool = handler.encode_pool
+        self.frame_pool = FrameBufferPool(pool.workers + pool.max_pending + 2, name=self.stream_id)
+
+        # Metrics
+        labels = {'camera': self.stream_id}
+        self.capture_time = REGISTRY.histogram(
+            'camera_capture_seconds', 'Time spent in camera.read()', labels)
+        self.encode_time = REGISTRY.histogram(
+            'camera_encode_seconds', 'Time spent encoding one frame for one tier', labels)
+        self.emit_time = REGISTRY.histogram(
+            'camera_emit_seconds', 'Time spent queueing encoded frames for emit', labels)
+        self.latency = REGISTRY.histogram(
+            'camera_frame_latency_seconds', 'Time from capture to the encoded frame being queued', labels)
+        self.frames_captured = REGISTRY.counter(
+            'camera_frames_captured_total', 'Frames read from the camera', labels)
+        self.frames_skipped = {
+            reason: REGISTRY.counter('camera_frames_skipped_total', 'Frames skipped before encoding',
+                                     dict(labels, reason=reason))
+            for reason in ('read_failed', 'no_due_tier', 'encode_backlog', 'no_free_buffer')
+        }
+        REGISTRY.gauge('camera_fps', f'Frames captured per second over the last {STATS_WINDOW:g}s',
+                       labels, func=lambda: self.get_rates()[0])
+        REGISTRY.gauge('camera_cpu_percent', 'CPU used capturing and encoding, in percent of one core',
+                       labels, func=lambda: self.get_rates()[1])
+
+    def _read(self, buffer):
+        """Read into a pooled buffer, measuring the CPU time of this thread; runs in run_blocking"""
+        cpu_start = time.thread_time()
+        success = buffer.read_from(self.camera)
+        return success, time.thread_time() - cpu_start
+
+    def _record(self, frames: int = 0, cpu_seconds: float = 0.0):
+        """Add to the fps and CPU counters and sample them for the rolling window"""
+        now = time.monotonic()
+        with self.lock:
+            self.frames += frames
+            self.cpu_seconds += cpu_seconds
+            if frames:
+                self.samples.append((now, self.frames, self.cpu_seconds))
+                while len(self.samples) > 2 and now - self.samples[0][0] > STATS_WINDOW:
+                    self.samples.popleft()
+
+    def get_rates(self):
+        """Capture fps and CPU percent over the last STATS_WINDOW seconds"""
+        with self.lock:
+            if len(self.samples) < 2:
+                return 0.0, 0.0
+            (start, start_frames, start_cpu), (end, end_frames, end_cpu) = self.samples[0], self.samples[-1]
+        elapsed = end - start
+        if elapsed <= 0:
+            return 0.0, 0.0
+        return (end_frames - start_frames) / elapsed, (end_cpu - start_cpu) / elapsed * 100
+
+    def stream_frame(self):
+        """Capture one frame and send it to each due rate tier; run by the scheduler"""
+        handler = self.handler
+        buffer = self.frame_pool.acquire()
+        if buffer is None:
+            # Every buffer is still being encoded; skip rather than allocate
+            self.frames_skipped['no_free_buffer'].inc()
+            return True
+
+        try:
+            start_time = time.perf_counter()
+            success, cpu_seconds = run_blocking(self._read, buffer)
+            captured_at = time.monotonic()
+            self.capture_time.observe(time.perf_counter() - start_time)
+            if not success:
+                # Returning False makes the scheduler back off instead of spinning
+                self.frames_skipped['read_failed'].inc()
+                return False
+            self.frames_captured.inc()
+            self._record(frames=1, cpu_seconds=cpu_seconds)
+
+            # Share the raw frame with in-process consumers (e.g. inference).
+            # The bus coalesces events, so it gets a copy rather than the
+            # pooled buffer, which would be overwritten by a later capture.
+            if handler.event_bus is not None and handler.event_bus.has_subscribers('frame'):
+                handler.event_bus.publish('frame', {'camera': self.stream_id, 'frame': buffer.array.copy()})
+
+            # Encode once per tier that is due; the pool queues results in capture order
+            due_tiers = handler.subscriptions.due_tiers('camera', key=self.stream_id)
+            if not due_tiers:
+                self.frames_skipped['no_due_tier'].inc()
+            for tier in due_tiers:
+                buffer.retain()
+                if not handler.encode_pool.submit(partial(self.queue_frame, tier, captured_at),
+                                                  self, buffer, tier, stream=self.stream_id):
+                    self.frames_skipped['encode_backlog'].inc()
+            return True
+        finally:
+            buffer.release()
+
+    def encode_frame(self, buffer, tier):
+        """
+        Encode a pooled frame for a rate tier; runs on the encode pool
+
+        Resizing and color conversion write into the buffer's scratch
+        arrays, and the JPEG output is passed on as a memoryview, so the
+        encoder's output is the only new allocation (plus the base64
+        string in base64 mode).
+
+        Returns:
+            Tuple (payload, CPU seconds spent)
+        """
+        cpu_start = time.thread_time()
+        handler = self.handler
+        settings = RATE_TIERS[tier]
+        frame = buffer.array
+        if settings['scale'] != 1.0:
+            height, width = frame.shape[:2]
+            size = (int(width * settings['scale']), int(height * settings['scale']))
+            resized = buffer.scratch(('resize', tier), (size[1], size[0]) + frame.shape[2:])
+            frame = cv2.resize(frame, size, dst=resized, interpolation=cv2.INTER_AREA)
+        if handler.color_mode != 'bgr':
+            converted = buffer.scratch(('color', tier), converted_shape(frame.shape, handler.color_mode))
+            frame = convert_color(frame, handler.color_mode, dst=converted)
+        encoded = memoryview(handler.encoder.encode(frame, settings['jpeg_quality'], handler.color_mode))
+
+        if handler.frame_format == 'binary':
+            # Socket.IO only sends bytes as binary attachments; backends that
+            # already return bytes are passed through without a copy
+            payload = encoded.obj if isinstance(encoded.obj, bytes) else encoded.tobytes()
+        else:
+            payload = base64.b64encode(encoded).decode('ascii')
+        return payload, time.thread_time() - cpu_start
+
+    def queue_frame(self, tier, captured_at, result, encode_seconds):
+        """Queue an encoded frame for its tier's room; called by the pool in capture order"""
+        emit_start = time.perf_counter()
+        payload, cpu_seconds = result
+        self.encode_time.observe(encode_seconds)
+        self._record(cpu_seconds=cpu_seconds)
+        self.handler.emit_queue.put('camera', 'camera_frame', {
+            'frame': payload,
+            'tier': tier,
+            'camera': self.stream_id
+        }, to=room_name('camera', tier), key=self.stream_id)
+        self.latency.observe(time.monotonic() - captured_at)
+        self.emit_time.observe(time.perf_counter() - emit_start)
+
+    def get_status(self):
+        """Get rates, latency and buffer state for this camera"""
+        fps, cpu_percent = self.get_rates()
+        latency = self.latency.get_status()
+        return {
+            'index': self.index,
+            'fps': round(fps, 2),
+            'cpu_percent': round(cpu_percent, 1),
+            'latency_ms': {key: latency[key] for key in ('mean_ms', 'p50_ms', 'p99_ms', 'max_ms')},
+            'frame_buffers': self.frame_pool.get_status()
+        }
+
+    def release(self):
+        """Release the capture device"""
+        if self.camera is not None:
+            self.camera.release()
+            self.camera = None
+
 
 class CameraHandler:
-    def __init__(self, camera_index_range=(0, 10), fps=10):
+    def __init__(self, camera_index_range=(0, 10), fps=10, event_bus=None, socketio=None,
+                 encoder=None, color_mode=None, encode_workers=None, frame_format=None,
+                 priorities=None, sensor_cameras=None):
+        """
+        Stream every camera found in camera_index_range
+
+        Each camera gets its own CameraStream (capture job, buffers, stream
+        ID). Encoding for all of them shares one worker pool bounded by the
+        core count, which serves cameras round-robin unless priorities say
+        otherwise.
+
+        Args:
+            camera_index_range (tuple): Camera indexes to probe
+            fps (int): Capture rate per camera
+            event_bus: Optional EventBus to share raw frames on; smoke_state
+                events from it boost sensor_cameras
+            socketio: SocketIO instance to run encode workers on; without
+                it frames are encoded on the capture job
+            encoder (str): JPEG backend, see jpeg_encoder.create_encoder()
+            color_mode (str): Layout frames are encoded from: 'bgr', 'gray'
+                or 'yuv420', defaults to the CAMERA_COLOR_MODE env var or 'bgr'
+            encode_workers (int): Parallel encodes shared by all cameras,
+                defaults to one less than the number of cores and never
+                exceeds it
+            frame_format (str): 'base64' or 'binary', defaults to the
+                CAMERA_FRAME_FORMAT env var or 'base64'
+            priorities (dict): Stream ID -> encode priority (higher first),
+                defaults to the CAMERA_PRIORITIES env var, e.g. "cam0=1"
+            sensor_cameras (list): Stream IDs nearest the smoke sensor, served
+                first while smoke is detected; defaults to the
+                SMOKE_SENSOR_CAMERAS env var, e.g. "cam0,cam2"
+        """
         self.camera_index_range = camera_index_range
-        self.camera = None
-        self.camera_available = False
+        self.event_bus = event_bus
         self.fps = fps
         self.frame_interval = 1 / fps
         self.is_running = False
+        self.socketio = socketio
 
-        self.find_available_camera()
+        self.encoder = create_encoder(encoder)
+        self.color_mode = (color_mode or os.environ.get('CAMERA_COLOR_MODE', 'bgr')).lower()
+        if self.color_mode not in COLOR_MODES:
+            raise ValueError(f"Unknown color mode '{self.color_mode}', expected one of {', '.join(COLOR_MODES)}")
+        if self.color_mode not in self.encoder.color_modes:
+            logger.warning("%s JPEG encoder cannot encode %s frames, using bgr",
+                           self.encoder.name, self.color_mode)
+            self.color_mode = 'bgr'
+        self.frame_format = (frame_format or os.environ.get('CAMERA_FRAME_FORMAT', 'base64')).lower()
+        if self.frame_format not in FRAME_FORMATS:
+            raise ValueError(f"Unknown frame format '{self.frame_format}', expected one of {', '.join(FRAME_FORMATS)}")
 
-    def find_available_camera(self):
+        cores = os.cpu_count() or 1
+        if encode_workers is None:
+            encode_workers = cores - 1
+        encode_workers = max(1, min(encode_workers, cores))
+        self.encode_pool = EncodePool(self._encode_frame, workers=encode_workers,
+                                      release=self._release_frame)
+
+        if priorities is None:
+            priorities = parse_priorities(os.environ.get('CAMERA_PRIORITIES'))
+        self.priorities: Dict[str, int] = dict(priorities)
+        if sensor_cameras is None:
+            sensor_cameras = parse_stream_ids(os.environ.get('SMOKE_SENSOR_CAMERAS'))
+        self.sensor_cameras = list(sensor_cameras)
+        self.boosted = set()
+
+        self.streams: Dict[str, CameraStream] = {}
+        self.find_available_cameras()
+        for camera_id in self.streams:
+            self._apply_priority(camera_id)
+
+        if event_bus is not None and self.sensor_cameras:
+            event_bus.subscribe('smoke_state', self._on_smoke_state)
+
+    @property
+    def camera_available(self) -> bool:
+        return bool(self.streams)
+
+    def find_available_cameras(self):
         for index in range(self.camera_index_range[0], self.camera_index_range[1] + 1):
-            self.camera = cv2.VideoCapture(index)
-            if self.camera.isOpened():
-                print(f"Camera found at index {index}")
-                self.camera_available = True
-                break
+            camera = cv2.VideoCapture(index)
+            if camera.isOpened():
+                stream = CameraStream(self, index, camera)
+                logger.info("Camera found at index %s, streaming as %s", index, stream.stream_id)
+                self.streams[stream.stream_id] = stream
             else:
-                self.camera.release()
-                self.camera = None
+                camera.release()
 
-        if not self.camera_available:
-            print("No camera found in the given range.")
+        if not self.streams:
+            logger.warning("No camera found in index range %s-%s", *self.camera_index_range)
 
-    def start(self, socketio):
+    def start(self, scheduler, emit_queue, subscriptions):
+        if self.is_running:
+            return
         if self.camera_available:
+            self.scheduler = scheduler
+            self.emit_queue = emit_queue
+            self.subscriptions = subscriptions
             self.is_running = True
-            self.thread = Thread(target=self._stream_frames, args=(socketio,))
-            self.thread.daemon = True
-            self.thread.start()
+            if self.socketio is not None:
+                self.encode_pool.start(self.socketio)
+            # Stagger the capture jobs so the cameras do not all read at once
+            for position, stream in enumerate(self.streams.values()):
+                scheduler.add_job(stream.job_name, stream.stream_frame, self.frame_interval,
+                                  start_delay=self.frame_interval * position / len(self.streams),
+                                  max_backoff=5.0)
         else:
-            print("No camera available, cannot start the feed.")
+            logger.warning("No camera available, cannot start the feed")
             
     def stop(self):
-        """Stop the camera feed"""
+        """Stop the camera feeds"""
         self.is_running = False
-        if hasattr(self, 'thread'):
-            self.thread.join()
-    
-    def _stream_frames(self, socketio):
-        """Stream frames at specified FPS"""
-        while self.is_running:
-            start_time = time.time()
-            
-            success, frame = self.camera.read()
-            if not success:
-                continue
-            
-            # Encode frame to JPEG
-            _, buffer = cv2.imencode('.jpg', frame)
-            frame_bytes = base64.b64encode(buffer).decode('utf-8')
-            
-            # Emit the frame
-            socketio.emit('camera_frame', {
-                'frame': frame_bytes
-            })
-            
-            # Maintain FPS
-            processing_time = time.time() - start_time
-            if processing_time < self.frame_interval:
-                time.sleep(self.frame_interval - processing_time)
+        if hasattr(self, 'scheduler'):
+            for stream in self.streams.values():
+                self.scheduler.remove_job(stream.job_name)
+        self.encode_pool.stop()
+
+    def _encode_frame(self, stream, buffer, tier):
+        return stream.encode_frame(buffer, tier)
+
+    def _release_frame(self, stream, buffer, tier):
+        """Return an encode job's reference to its frame buffer"""
+        buffer.release()
+
+    def set_priority(self, camera_id: str, priority: int):
+        """Set a camera's encode priority; higher is served first, the default is 0"""
+        self.priorities[camera_id] = priority
+        self._apply_priority(camera_id)
+
+    def boost(self, camera_ids: Iterable[str]):
+        """Serve these cameras before all others until clear_boost()"""
+        self.boosted = {camera_id for camera_id in camera_ids if camera_id in self.streams}
+        for camera_id in self.streams:
+            self._apply_priority(camera_id)
+
+    def clear_boost(self):
+        """Return every camera to its configured priority"""
+        self.boost(())
+
+    def _apply_priority(self, camera_id: str):
+        priority = self.priorities.get(camera_id, 0)
+        if camera_id in self.boosted:
+            priority += BOOST_PRIORITY
+        self.encode_pool.set_priority(camera_id, priority)
+
+    def _on_smoke_state(self, event):
+        """Put the cameras nearest the smoke sensor first while smoke is detected"""
+        if event.data['smoke_detected']:
+            self.boost(self.sensor_cameras)
+        else:
+            self.clear_boost()
+
+    def get_status(self):
+        """Get encoder settings, the shared pool state and per-camera rates"""
+        return {
+            'encoder': self.encoder.name,
+            'color_mode': self.color_mode,
+            'frame_format': self.frame_format,
+            'encode_pool': self.encode_pool.get_status(),
+            'boosted': sorted(self.boosted),
+            'cameras': {camera_id: stream.get_status() for camera_id, stream in self.streams.items()}
+        }
     
     def __del__(self):
         """Clean up resources"""
         self.stop()
-        if self.camera is not None:
-            self.camera.release()
\ No newline at end of file
+        for stream in self.streams.values():
+            stream.release()
@@ -3,158 +3,162 @@ import threading
 import time
 import json
 import logging
-from functools import wraps
-from typing import Dict, Any
+from modules.metrics import REGISTRY, SIZE_BUCKETS
+from modules.subscriptions import room_name
 
 # Setup module logger
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-
-def rate_limited_logging(interval: float):
-    """
-    Decorator to rate limit logging calls
-    
-    Args:
-        interval (float): Minimum time between logs in seconds
-    """
-    def decorator(func):
-        last_log_time: Dict[str, float] = {}
-        
-        @wraps(func)
-        def wrapper(self, *args, **kwargs):
-            current_time = time.time()
-            # Get unique key for each logging type
-            log_key = f"{func.__name__}_{args[0] if args else ''}"
-            
-            # Check if enough time has passed since last log
-            if (log_key not in last_log_time or 
-                current_time - last_log_time[log_key] >= interval):
-                last_log_time[log_key] = current_time
-                return func(self, *args, **kwargs)
-            return None
-        return wrapper
-    return decorator
 
 class DataHandler:
-    def __init__(self, gpio_handler, alarm_handler, interval=1.0):
+    def __init__(self, gpio_handler, alarm_handler, event_bus, interval=1.0):
         """
         Initialize the data handler
         
         Args:
-            gpio_handler: Instance of GPIOHandler to get smoke detector data
-            alarm_handler: Instance of AlarmHandler
+            gpio_handler: Instance of GPIOHandler, read once for the initial state
+            alarm_handler: Instance of AlarmHandler, read once for the initial state
+            event_bus: EventBus delivering smoke, alarm and filtered value updates
             interval (float): Data collection interval in seconds
         """
-        self.gpio_handler = gpio_handler
-        self.alarm_handler = alarm_handler
         self.interval = interval
         self.is_running = False
         self.data_points = []
         self.max_data_points = 100  # Keep last 100 readings
+        self.lock = threading.Lock()  # Appended by the sampler, read by connecting clients
+
+        # Metrics
+        self.cycle_time = REGISTRY.histogram(
+            'data_cycle_seconds', 'Time to record and queue one data point')
+        self.payload_bytes = REGISTRY.histogram(
+            'data_payload_bytes', 'Estimated JSON size of the full_dataset payload', buckets=SIZE_BUCKETS)
+
+        # Latest known state, kept current by event bus subscriptions
+        alarm_status = alarm_handler.get_status()
+        self.state = {
+            'smoke_detected': gpio_handler.current_state,
+            'filtered_value': 0.0,
+            'alarm_active': alarm_status.get('alarm_active', False),
+            'alarm_enabled': alarm_status.get('alarm_enabled', True)
+        }
+        event_bus.subscribe('smoke_state', self._handle_state_event)
+        event_bus.subscribe('alarm_state', self._handle_state_event)
+        event_bus.subscribe('filtered_value', self._handle_filtered_value)
         
-        self._rate_limited_info("Initializing DataHandler with {} max data points".format(self.max_data_points))
-        self._rate_limited_info("Data collection interval set to {} seconds".format(interval))
-        
-    @rate_limited_logging(10.0)
-    def _rate_limited_info(self, message: str) -> None:
-        """Rate-limited info logging"""
-        logger.info(message)
-        
-    @rate_limited_logging(10.0)
-    def _rate_limited_warning(self, message: str) -> None:
-        """Rate-limited warning logging"""
-        logger.warning(message)
-        
-    @rate_limited_logging(10.0)
-    def _rate_limited_error(self, message: str) -> None:
-        """Rate-limited error logging"""
-        logger.error(message)
-        
-    @rate_limited_logging(10.0)
-    def _rate_limited_debug(self, message: str) -> None:
-        """Rate-limited debug logging"""
-        logger.debug(message)
+        logger.info("Initializing DataHandler with %s max data points", self.max_data_points)
+        logger.info("Data collection interval set to %s seconds", interval)
         
-    def start(self, socketio):
-        """Start collecting and sending data"""
+    def start(self, scheduler, emit_queue, subscriptions):
+        """Start collecting data and sending it to data channel subscribers"""
+        if self.is_running:
+            return
         try:
-            self._rate_limited_info("Starting data collection service...")
-            self.socketio = socketio
+            logger.info("Starting data collection service...")
+            self.scheduler = scheduler
+            self.emit_queue = emit_queue
+            self.subscriptions = subscriptions
             self.is_running = True
-            self.thread = threading.Thread(target=self._collect_data)
-            self.thread.daemon = True
-            self.thread.start()
-            self._rate_limited_info("Data collection thread started successfully")
+            scheduler.add_job('data_collection', self._collect_data, self.interval)
+            logger.info("Data collection job scheduled successfully")
         except Exception as e:
-            self._rate_limited_error(f"Failed to start data collection: {str(e)}")
+            logger.error("Failed to start data collection: %s", e)
             logger.exception("Data collection start error details:")
             raise
         
     def stop(self):
         """Stop collecting data"""
         try:
-            self._rate_limited_info("Stopping data collection service...")
+            logger.info("Stopping data collection service...")
             self.is_running = False
-            if hasattr(self, 'thread'):
-                self.thread.join()
-                self._rate_limited_info("Data collection thread stopped successfully")
+            if hasattr(self, 'scheduler'):
+                self.scheduler.remove_job('data_collection')
+                logger.info("Data collection job removed successfully")
         except Exception as e:
-            self._rate_limited_error(f"Error stopping data collection: {str(e)}")
+            logger.error("Error stopping data collection: %s", e)
             
-    def _collect_data(self):
-        """Collect data at specified intervals and emit to frontend"""
-        self._rate_limited_info("Starting data collection loop")
-        while self.is_running:
-            try:
-                # Get current status from both GPIO handler and alarm handler
-                gpio_status = self.gpio_handler.get_status()
-                alarm_status = self.alarm_handler.get_status()
-
-                # Create data point
-                data_point = {
-                    'timestamp': datetime.now().isoformat(),
-                    'smoke_detected': gpio_status['smoke_detected'],
-                    'alarm_active': alarm_status.get('alarm_active', False),
-                    'alarm_enabled': alarm_status.get('alarm_enabled', True)
-                }
+    def _handle_state_event(self, event):
+        """
+        Keep the latest smoke and alarm state for the next data point
+
+        The time series stays on the sampling cadence; clients get state
+        changes immediately through status updates instead.
+        """
+        self.state.update(event.data)
+
+    def _handle_filtered_value(self, event):
+        """Keep the latest filtered sensor value for the next data point"""
+        self.state['filtered_value'] = event.data
+
+    def _record_data_point(self):
+        """Append a data point from the latest state and emit it to subscribers"""
+        cycle_start = time.perf_counter()
+        with self.lock:
+            data_point = {
+                'timestamp': datetime.now().isoformat(),
+                **self.state
+            }
 
-                # Add to data points list
-                self.data_points.append(data_point)
-                
-                if data_point['smoke_detected']:
-                    self._rate_limited_warning("Smoke detection recorded in data point")
-                if data_point['alarm_active']:
-                    self._rate_limited_warning("Alarm activation recorded in data point")
-
-                # Keep only the last max_data_points
-                if len(self.data_points) > self.max_data_points:
-                    self.data_points.pop(0)
-                    self._rate_limited_debug("Removed oldest data point to maintain maximum limit")
-
-                # Generate summary before emitting
-                summary = self._generate_summary()
-                
-                # Emit current data point and full dataset
-                self.socketio.emit('new_data_point', data_point)
-                self.socketio.emit('full_dataset', {
-                    'data': self.data_points,
-                    'summary': summary
-                })
-                
-                self._rate_limited_debug(f"Emitted new data point: {data_point}")
-                self._rate_limited_debug(f"Current summary: {summary}")
-
-                time.sleep(self.interval)
-            except Exception as e:
-                self._rate_limited_error(f"Error in data collection cycle: {str(e)}")
-                logger.exception("Data collection error details:")
-                time.sleep(self.interval)
+            # Add to data points list
+            self.data_points.append(data_point)
+
+            # Keep only the last max_data_points
+            if len(self.data_points) > self.max_data_points:
+                self.data_points.pop(0)
+                logger.debug("Removed oldest data point to maintain maximum limit", extra={'rate_limit': True})
+
+            # Generate summary before emitting
+            summary = self._generate_summary()
+            dataset = {
+                'data': list(self.data_points),
+                'summary': summary
+            }
+            point_count = len(self.data_points)
+
+        if data_point['smoke_detected']:
+            logger.warning("Smoke detection recorded in data point")
+        if data_point['alarm_active']:
+            logger.warning("Alarm activation recorded in data point")
+
+        # Emit current data point and full dataset to each due tier
+        due_tiers = self.subscriptions.due_tiers('data')
+        for tier in due_tiers:
+            room = room_name('data', tier)
+            self.emit_queue.put('data', 'new_data_point', data_point, to=room)
+            self.emit_queue.put('data', 'full_dataset', dataset, to=room)
+        self.cycle_time.observe(time.perf_counter() - cycle_start)
+        if due_tiers:
+            self.payload_bytes.observe(self._estimate_payload_bytes(data_point, summary, point_count))
+        
+        logger.debug("Emitted new data point: %s", data_point, extra={'rate_limit': True})
+        logger.debug("Current summary: %s", summary, extra={'rate_limit': True})
+
+    @staticmethod
+    def _estimate_payload_bytes(data_point, summary, point_count):
+        """
+        JSON size of a full_dataset payload without serializing all of it
+
+        Data points all have the same fields, so the newest one times the
+        point count (plus separators and the summary) is close to exact.
+        """
+        envelope = len('{"data": [], "summary": }')
+        separators = 2 * max(point_count - 1, 0)
+        return (envelope + separators + len(json.dumps(summary))
+                + point_count * len(json.dumps(data_point)))
+
+    def _collect_data(self):
+        """Sample the latest state for the time series; run by the scheduler"""
+        try:
+            self._record_data_point()
+            return True
+        except Exception as e:
+            logger.error("Error in data collection cycle: %s", e)
+            logger.exception("Data collection error details:")
+            return False
 
     def _generate_summary(self):
         """Generate summary statistics from collected data"""
         try:
             if not self.data_points:
-                self._rate_limited_debug("No data points available for summary generation")
+                logger.debug("No data points available for summary generation")
                 return {
                     'smoke_detections': 0,
                     'alarm_activations': 0,
@@ -170,11 +174,11 @@ class DataHandler:
                 'uptime': (last_timestamp - first_timestamp).total_seconds()
             }
             
-            self._rate_limited_debug(f"Generated summary statistics: {summary}")
+            logger.debug("Generated summary statistics: %s", summary, extra={'rate_limit': True})
             return summary
             
         except Exception as e:
-            self._rate_limited_error(f"Error generating summary: {str(e)}")
+            logger.error("Error generating summary: %s", e)
             logger.exception("Summary generation error details:")
             return {
                 'smoke_detections': 0,
@@ -186,14 +190,15 @@ class DataHandler:
     def get_current_data(self):
         """Get the current dataset and summary"""
         try:
-            self._rate_limited_debug("Retrieving current dataset and summary")
-            current_data = {
-                'data': self.data_points,
-                'summary': self._generate_summary()
-            }
+            logger.debug("Retrieving current dataset and summary")
+            with self.lock:
+                current_data = {
+                    'data': list(self.data_points),
+                    'summary': self._generate_summary()
+                }
             return current_data
         except Exception as e:
-            self._rate_limited_error(f"Error retrieving current data: {str(e)}")
+            logger.error("Error retrieving current data: %s", e)
             return {
                 'data': [],
                 'summary': {
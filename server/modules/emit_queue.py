@@ -0,0 +1,140 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+from modules.metrics import REGISTRY
+
+# Setup module logger
+logger = logging.getLogger(__name__)
+
+# Maximum queued messages per room, keyed by channel. Camera frames go stale
+# quickly so only the newest couple are kept (per camera, see put()'s key).
+QUEUE_SIZES = {
+    'camera': 2,
+    'data': 10,
+    'status': 64,
+}
+DEFAULT_QUEUE_SIZE = 16
+
+
+class EmitQueue:
+    def __init__(self, socketio):
+        """
+        Bounded outgoing Socket.IO queue so producers never block on network I/O
+
+        Producers call put() from any thread; a single background task drains
+        the queues and performs the actual emits, sleeping until put() wakes
+        it when there is nothing to send. When a queue is full the oldest
+        message is dropped.
+
+        Args:
+            socketio: SocketIO instance used for the actual emits
+        """
+        self.socketio = socketio
+        self.condition = threading.Condition()
+        self.queued = 0
+        self.queues: Dict[str, Deque] = {}  # room -> deque of (channel, event, data, to, namespace)
+        self.dropped: Dict[str, int] = {}
+        self.sent = 0
+        self.is_running = False
+        self.emit_time = REGISTRY.histogram(
+            'emit_queue_emit_seconds', 'Time spent in socketio.emit per message')
+        self.sent_counters = {
+            channel: REGISTRY.counter('emit_queue_sent_total', 'Messages emitted from the queue',
+                                      labels={'channel': channel})
+            for channel in QUEUE_SIZES
+        }
+        self.dropped_counters = {
+            channel: REGISTRY.counter('emit_queue_dropped_total', 'Messages dropped from full emit queues',
+                                      labels={'channel': channel})
+            for channel in QUEUE_SIZES
+        }
+
+    def put(self, channel: str, event: str, data, to: Optional[str] = None,
+            namespace: Optional[str] = None, key: Optional[str] = None):
+        """
+        Queue an emit without blocking
+
+        Args:
+            channel (str): Channel the message belongs to, sets the queue size
+            event (str): Socket.IO event name
+            data: Event payload
+            to (str): Room to emit to; None broadcasts to everyone
+            namespace (str): Socket.IO namespace; None is the default one
+            key (str): Separate source sharing the room (e.g. a camera stream
+                ID) that gets its own queue, so a backlog from one source
+                never drops another's messages
+        """
+        room = to or channel
+        if namespace is not None:
+            # Rooms are per namespace, so are the queues
+            room = f"{namespace}/{room}"
+        if key is not None:
+            room = f"{room}#{key}"
+        with self.condition:
+            queue = self.queues.get(room)
+            if queue is None:
+                queue = deque(maxlen=QUEUE_SIZES.get(channel, DEFAULT_QUEUE_SIZE))
+                self.queues[room] = queue
+                self.dropped[room] = 0
+            if len(queue) == queue.maxlen:
+                self.dropped[room] += 1
+                if channel in self.dropped_counters:
+                    self.dropped_counters[channel].inc()
+            else:
+                self.queued += 1
+            queue.append((channel, event, data, to, namespace))
+            self.condition.notify()
+
+    def start(self):
+        """Start the background task that drains the queues"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self.socketio.start_background_task(self._drain)
+        logger.info("Emit queue started")
+
+    def stop(self):
+        """Stop draining; queued messages are discarded"""
+        with self.condition:
+            self.is_running = False
+            self.condition.notify()
+
+    def _drain(self):
+        """Emit queued messages, one per room per pass so no room starves"""
+        while True:
+            with self.condition:
+                while self.is_running and not self.queued:
+                    self.condition.wait()
+                if not self.is_running:
+                    return
+                # Take one message per room under the lock, emit outside it
+                batch = []
+                for queue in self.queues.values():
+                    if queue:
+                        batch.append(queue.popleft())
+                self.queued -= len(batch)
+
+            for channel, event, data, to, namespace in batch:
+                try:
+                    emit_start = time.perf_counter()
+                    self.socketio.emit(event, data, to=to, namespace=namespace)
+                    self.emit_time.observe(time.perf_counter() - emit_start)
+                    self.sent += 1
+                    if channel in self.sent_counters:
+                        self.sent_counters[channel].inc()
+                except Exception as e:
+                    logger.error("Error emitting %s: %s", event, e)
+
+            # Yield to the server between passes
+            self.socketio.sleep(0)
+
+    def get_status(self):
+        """Get queue depths and drop counts per room"""
+        with self.condition:
+            return {
+                'sent': self.sent,
+                'queued': {room: len(queue) for room, queue in self.queues.items()},
+                'dropped': dict(self.dropped)
+            }
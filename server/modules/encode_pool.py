@@ -0,0 +1,198 @@
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Hashable, Optional, Tuple
+from modules.server_mode import run_blocking
+
+# Setup module logger
+logger = logging.getLogger(__name__)
+
+DEFAULT_STREAM = 'default'
+
+
+class EncodePool:
+    def __init__(self, encode: Callable, workers: int = 2, max_pending: int = 4,
+                 release: Optional[Callable] = None):
+        """
+        Run encode() on a shared set of workers, delivering results in
+        submit order per stream
+
+        Workers are Socket.IO background tasks that call encode() through
+        run_blocking, so the encoding itself runs on native threads in every
+        server mode; the JPEG backends release the GIL while they work.
+
+        Items belong to a stream (e.g. one per camera). Within a stream,
+        results are handed to their callbacks strictly in submit order: a
+        result that finishes early waits for the ones before it. When
+        max_pending items of a stream are already waiting for a worker, its
+        oldest one is dropped, since a stale frame is worth less than a new
+        one.
+
+        A free worker takes the next item from the highest priority stream
+        that has work, and among equal priorities from the one served least
+        recently, so with default priorities streams are served round-robin.
+
+        Until start() is called, submit() encodes inline.
+
+        Args:
+            encode (callable): Function to run, called with submit()'s args
+            workers (int): Number of worker tasks shared by all streams
+            max_pending (int): Items per stream allowed to wait for a worker
+            release (callable): Called with an item's args once the pool is
+                done with them: after encoding, or when the item is dropped
+                or discarded. Never called inside run_blocking.
+        """
+        self.encode = encode
+        self.workers = workers
+        self.max_pending = max_pending
+        self.release = release
+        self.condition = threading.Condition()
+        self.pending: Dict[Hashable, Deque] = {}  # stream -> deque of (sequence, args, callback)
+        self.done: Dict[Tuple, tuple] = {}  # (stream, sequence) -> (callback, result, duration), None if skipped
+        self.next_sequence: Dict[Hashable, int] = {}
+        self.next_delivery: Dict[Hashable, int] = {}
+        self.priorities: Dict[Hashable, int] = {}
+        self.last_served: Dict[Hashable, int] = {}
+        self.serve_counter = itertools.count(1)
+        self.generation = 0
+        self.dropped = 0
+        self.failed = 0
+        self.is_running = False
+
+    def start(self, socketio):
+        """Start the worker tasks"""
+        with self.condition:
+            if self.is_running:
+                return
+            self.is_running = True
+            # Workers left over from before a stop() exit on a generation change
+            self.generation += 1
+            generation = self.generation
+        for _ in range(self.workers):
+            socketio.start_background_task(self._worker, generation)
+        logger.info("Encode pool started with %s workers", self.workers)
+
+    def stop(self):
+        """Stop the workers; pending items are discarded"""
+        with self.condition:
+            self.is_running = False
+            discarded = [item for queue in self.pending.values() for item in queue]
+            self.pending.clear()
+            self.done.clear()
+            self.next_delivery = dict(self.next_sequence)
+            self.condition.notify_all()
+        for _, args, _ in discarded:
+            self._release(args)
+
+    def set_priority(self, stream: Hashable, priority: int):
+        """Set a stream's priority; higher is served first, the default is 0"""
+        with self.condition:
+            self.priorities[stream] = priority
+
+    def submit(self, callback: Callable, *args, stream: Hashable = DEFAULT_STREAM) -> bool:
+        """
+        Queue encode(*args); callback(result, duration) is called in order
+
+        Returns:
+            False if an older pending item of the stream was dropped to make room
+        """
+        if not self.is_running:
+            start_time = time.perf_counter()
+            try:
+                result = run_blocking(self.encode, *args)
+            finally:
+                self._release(args)
+            callback(result, time.perf_counter() - start_time)
+            return True
+
+        dropped_args = None
+        with self.condition:
+            sequence = self.next_sequence.get(stream, 0)
+            self.next_sequence[stream] = sequence + 1
+            self.next_delivery.setdefault(stream, sequence)
+            queue = self.pending.setdefault(stream, deque())
+            if len(queue) >= self.max_pending:
+                old_sequence, dropped_args, _ = queue.popleft()
+                self.done[(stream, old_sequence)] = None
+                self.dropped += 1
+                self._deliver(stream)
+            queue.append((sequence, args, callback))
+            self.condition.notify()
+        if dropped_args is not None:
+            self._release(dropped_args)
+            return False
+        return True
+
+    def _release(self, args):
+        if self.release is not None:
+            try:
+                self.release(*args)
+            except Exception as e:
+                logger.error("Error releasing encode item: %s", e)
+
+    def _deliver(self, stream: Hashable):
+        """Hand a stream's finished results to their callbacks in order; caller holds the condition"""
+        while (stream, self.next_delivery[stream]) in self.done:
+            entry = self.done.pop((stream, self.next_delivery[stream]))
+            self.next_delivery[stream] += 1
+            if entry is None:
+                continue
+            callback, result, duration = entry
+            try:
+                callback(result, duration)
+            except Exception as e:
+                logger.error("Error in encode callback: %s", e)
+
+    def _next_stream(self) -> Optional[Hashable]:
+        """Highest priority stream with work, least recently served first; caller holds the condition"""
+        best = None
+        for stream, queue in self.pending.items():
+            if not queue:
+                continue
+            key = (-self.priorities.get(stream, 0), self.last_served.get(stream, 0))
+            if best is None or key < best[0]:
+                best = (key, stream)
+        return best[1] if best is not None else None
+
+    def _worker(self, generation: int):
+        while True:
+            with self.condition:
+                while True:
+                    if self.generation != generation or not self.is_running:
+                        return
+                    stream = self._next_stream()
+                    if stream is not None:
+                        break
+                    self.condition.wait()
+                sequence, args, callback = self.pending[stream].popleft()
+                self.last_served[stream] = next(self.serve_counter)
+
+            start_time = time.perf_counter()
+            try:
+                entry = (callback, run_blocking(self.encode, *args), time.perf_counter() - start_time)
+            except Exception as e:
+                logger.error("Encode failed: %s", e)
+                entry = None
+            self._release(args)
+
+            with self.condition:
+                if entry is None:
+                    self.failed += 1
+                # Results from before a stop() are no longer wanted
+                if sequence >= self.next_delivery.get(stream, 0):
+                    self.done[(stream, sequence)] = entry
+                    self._deliver(stream)
+
+    def get_status(self):
+        """Get worker count, backlog and drop counters"""
+        with self.condition:
+            return {
+                'workers': self.workers if self.is_running else 0,
+                'pending': {stream: len(queue) for stream, queue in self.pending.items()},
+                'priorities': dict(self.priorities),
+                'waiting_for_order': len(self.done),
+                'dropped': self.dropped,
+                'failed': self.failed
+            }
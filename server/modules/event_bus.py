@@ -0,0 +1,142 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+from typing import Callable, Dict, List
+
+# Setup module logger
+logger = logging.getLogger(__name__)
+
+# Event types and the minimum time between deliveries of each. Events
+# published faster than that are coalesced: subscribers get the latest one.
+EVENT_TYPES = {
+    'smoke_state': 0.0,
+    'alarm_state': 0.0,
+    'filtered_value': 0.2,
+    'frame': 0.0,
+}
+
+Event = namedtuple('Event', ['type', 'data', 'timestamp'])
+
+# Subscriber priority for alarm actuation, so it runs before anything that
+# only records or reports the same event
+ALARM_PRIORITY = 100
+
+
+class EventBus:
+    def __init__(self):
+        """
+        In-process publish/subscribe bus for state changes
+
+        publish() never blocks on subscribers: it stores the event and wakes
+        the dispatch task, which delivers the latest event of each type to
+        that type's subscribers.
+        """
+        self.condition = threading.Condition()
+        self.subscribers: Dict[str, List[Callable]] = {event_type: [] for event_type in EVENT_TYPES}
+        self.subscriber_priorities: Dict[str, List[int]] = {event_type: [] for event_type in EVENT_TYPES}
+        self.pending: Dict[str, Event] = {}
+        self.last_dispatch: Dict[str, float] = {}
+        self.published = 0
+        self.coalesced = 0
+        self.is_running = False
+
+    def subscribe(self, event_type: str, callback: Callable, priority: int = 0):
+        """
+        Register a callback for an event type
+
+        Callbacks receive an Event and run on the dispatch task, so they
+        should not block for long. They are called in order of priority,
+        highest first, and in subscription order within a priority.
+        """
+        if event_type not in EVENT_TYPES:
+            raise ValueError(f"Unknown event type '{event_type}'")
+        with self.condition:
+            priorities = self.subscriber_priorities[event_type]
+            position = len(priorities)
+            for index, existing in enumerate(priorities):
+                if existing < priority:
+                    position = index
+                    break
+            priorities.insert(position, priority)
+            self.subscribers[event_type].insert(position, callback)
+
+    def unsubscribe(self, event_type: str, callback: Callable):
+        """Remove a previously registered callback"""
+        with self.condition:
+            if callback in self.subscribers.get(event_type, []):
+                index = self.subscribers[event_type].index(callback)
+                del self.subscribers[event_type][index]
+                del self.subscriber_priorities[event_type][index]
+
+    def has_subscribers(self, event_type: str) -> bool:
+        """Check whether publishing an event type would reach anyone"""
+        return bool(self.subscribers.get(event_type))
+
+    def publish(self, event_type: str, data):
+        """Publish an event without blocking; unknown types raise ValueError"""
+        if event_type not in EVENT_TYPES:
+            raise ValueError(f"Unknown event type '{event_type}'")
+        with self.condition:
+            if event_type in self.pending:
+                self.coalesced += 1
+            self.pending[event_type] = Event(event_type, data, time.monotonic())
+            self.published += 1
+            self.condition.notify()
+
+    def start(self, socketio):
+        """Start the dispatch loop as a Socket.IO background task"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self.thread = socketio.start_background_task(self._dispatch)
+        logger.info("Event bus started")
+
+    def stop(self):
+        """Stop the dispatch loop"""
+        with self.condition:
+            self.is_running = False
+            self.condition.notify()
+
+    def _take_due_events(self) -> List[Event]:
+        """Wait for pending events whose coalescing interval has elapsed"""
+        with self.condition:
+            while self.is_running:
+                now = time.monotonic()
+                due = []
+                next_due = None
+                for event_type, event in self.pending.items():
+                    ready_at = self.last_dispatch.get(event_type, 0.0) + EVENT_TYPES[event_type]
+                    if ready_at <= now:
+                        due.append(event)
+                    elif next_due is None or ready_at < next_due:
+                        next_due = ready_at
+
+                if due:
+                    for event in due:
+                        del self.pending[event.type]
+                        self.last_dispatch[event.type] = now
+                    # Deliver in publish order
+                    return sorted(due, key=lambda event: event.timestamp)
+
+                self.condition.wait(None if next_due is None else next_due - now)
+            return []
+
+    def _dispatch(self):
+        """Deliver events to subscribers until stopped"""
+        while self.is_running:
+            for event in self._take_due_events():
+                for callback in list(self.subscribers[event.type]):
+                    try:
+                        callback(event)
+                    except Exception as e:
+                        logger.error("Error in %s subscriber: %s", event.type, e)
+
+    def get_status(self):
+        """Get publish and coalescing counters"""
+        with self.condition:
+            return {
+                'published': self.published,
+                'coalesced': self.coalesced,
+                'pending': list(self.pending)
+            }
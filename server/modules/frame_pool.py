@@ -0,0 +1,130 @@
+import logging
+import threading
+from collections import deque
+from typing import Deque, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+from modules.metrics import REGISTRY
+
+# Setup module logger
+logger = logging.getLogger(__name__)
+
+
+class FrameBuffer:
+    """
+    Reusable frame array plus scratch arrays for the stages that follow
+    capture (resizing, color conversion), reference counted by the pool
+    """
+
+    def __init__(self, pool: 'FrameBufferPool'):
+        self.pool = pool
+        self.array: Optional[np.ndarray] = None
+        self.scratch_arrays: Dict[Hashable, np.ndarray] = {}
+        self.refs = 0
+
+    def read_from(self, camera) -> bool:
+        """
+        Read the next frame into this buffer's array
+
+        The first read, or one after the camera changed resolution,
+        allocates; every other read reuses the array in place.
+        """
+        success, frame = camera.read(self.array) if self.array is not None else camera.read()
+        if success and frame is not self.array:
+            self.array = frame
+            self.scratch_arrays.clear()
+            self.pool.count_allocation()
+        return success
+
+    def scratch(self, key: Hashable, shape: Tuple[int, ...]) -> np.ndarray:
+        """Get a scratch array for one stage, allocating it on first use"""
+        array = self.scratch_arrays.get(key)
+        if array is None or array.shape != shape:
+            array = np.empty(shape, dtype=np.uint8)
+            self.scratch_arrays[key] = array
+            self.pool.count_allocation()
+        return array
+
+    def retain(self):
+        """Take another reference, e.g. for each encode job using this frame"""
+        self.pool.retain(self)
+
+    def release(self):
+        """Drop a reference; the buffer returns to the pool with the last one"""
+        self.pool.release(self)
+
+
+class FrameBufferPool:
+    def __init__(self, size: int, name: str = 'camera'):
+        """
+        Fixed set of frame buffers reused across captures
+
+        A buffer is acquired by the capture step, retained once per
+        downstream job that reads it and released by each of them; it is
+        only read into again after the last release. Arrays are allocated
+        on first use, so the pool adapts to whatever resolution the camera
+        delivers.
+
+        Args:
+            size (int): Number of buffers; when all are in use, acquire()
+                returns None and the caller should skip the frame
+            name (str): Pool name for the metric labels
+        """
+        self.size = size
+        self.lock = threading.Lock()
+        self.free: Deque[FrameBuffer] = deque(FrameBuffer(self) for _ in range(size))
+        self.allocations = 0
+        self.exhausted = 0
+
+        # Metrics
+        labels = {'pool': name}
+        self.allocation_counter = REGISTRY.counter(
+            'frame_buffer_allocations_total', 'Arrays allocated by frame buffer pools', labels)
+        self.exhausted_counter = REGISTRY.counter(
+            'frame_buffer_exhausted_total', 'Captures skipped because every buffer was in use', labels)
+        REGISTRY.gauge('frame_buffers_in_use', 'Frame buffers currently held', labels,
+                       func=self.in_use)
+
+    def acquire(self) -> Optional[FrameBuffer]:
+        """Take a free buffer with one reference, or None if all are in use"""
+        with self.lock:
+            if not self.free:
+                self.exhausted += 1
+                self.exhausted_counter.inc()
+                return None
+            # Most recently released first, so a pipeline that keeps up only
+            # ever touches (and allocates) one or two buffers
+            buffer = self.free.pop()
+            buffer.refs = 1
+            return buffer
+
+    def retain(self, buffer: FrameBuffer):
+        with self.lock:
+            buffer.refs += 1
+
+    def release(self, buffer: FrameBuffer):
+        with self.lock:
+            buffer.refs -= 1
+            if buffer.refs == 0:
+                self.free.append(buffer)
+            elif buffer.refs < 0:
+                buffer.refs = 0
+                logger.error("Frame buffer released more often than retained")
+
+    def count_allocation(self):
+        self.allocations += 1
+        self.allocation_counter.inc()
+
+    def in_use(self) -> int:
+        """Number of buffers currently held"""
+        return self.size - len(self.free)
+
+    def get_status(self):
+        """Get pool size, usage and allocation counters"""
+        return {
+            'size': self.size,
+            'in_use': self.in_use(),
+            'allocations': self.allocations,
+            'exhausted': self.exhausted
+        }
@@ -0,0 +1,407 @@
+import logging
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+import socketio as socketio_client
+from flask import request
+from flask_socketio import Namespace, emit, join_room, leave_room
+
+from modules.metrics import REGISTRY
+from modules.startup import STARTING, READY, UNAVAILABLE
+from modules.subscriptions import SubscriptionManager, RATE_TIERS, DEFAULT_TIER, room_name
+
+# Setup module logger
+logger = logging.getLogger(__name__)
+
+# Events relayed from a node, keyed by the channel they belong to
+UPSTREAM_EVENTS = {
+    'camera_frame': 'camera',
+    'new_data_point': 'data',
+    'full_dataset': 'data',
+    'status_update': 'status',
+    'alarm_status': 'status',
+}
+
+# Camera tier the gateway takes from a node when nobody downstream watches
+# it, so the cached frame stays fresh at little cost to the node
+IDLE_CAMERA_TIER = 'thumbnail'
+
+NODE_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+def parse_nodes(spec: Optional[str]) -> Dict[str, str]:
+    """
+    Parse a node list such as "kitchen=http://10.0.0.5:5000,garage=http://10.0.0.6:5000"
+
+    Raises:
+        ValueError: On a malformed entry or duplicate name
+    """
+    nodes = {}
+    for item in (spec or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, url = item.partition('=')
+        name, url = name.strip(), url.strip()
+        if not NODE_NAME_PATTERN.match(name) or not url:
+            raise ValueError(f"Invalid node '{item}', expected name=url")
+        if name in nodes:
+            raise ValueError(f"Duplicate node name '{name}'")
+        nodes[name] = url
+    return nodes
+
+
+def node_namespace(name: str) -> str:
+    """Socket.IO namespace a node is re-served on"""
+    return f"/nodes/{name}"
+
+
+class NodeClient:
+    def __init__(self, name: str, url: str, emit_queue, startup=None, max_retry_delay: float = 30.0):
+        """
+        Single upstream Socket.IO connection to one detector node
+
+        The gateway is the node's only consumer: it keeps the latest status,
+        dataset and camera frame, and relays them to the clients of the
+        node's namespace through the shared emit queue, applying each
+        client's rate tier itself.
+
+        The node is asked for full-rate camera frames only while a
+        downstream client watches at full rate. Thumbnail clients then get
+        those full-size frames throttled to their tier's interval.
+
+        Args:
+            name (str): Node name, used in the namespace and metric labels
+            url (str): Node base URL, e.g. http://10.0.0.5:5000
+            emit_queue: Shared EmitQueue for downstream emits
+            startup: Optional StartupTracker to record connection state in
+            max_retry_delay (float): Upper bound for the initial connect backoff
+        """
+        self.name = name
+        self.url = url
+        self.namespace = node_namespace(name)
+        self.emit_queue = emit_queue
+        self.startup = startup
+        self.max_retry_delay = max_retry_delay
+        self.subscriptions = SubscriptionManager()
+        self.lock = threading.Lock()
+        self.is_running = False
+        self.connected = False
+        self.camera_tier = IDLE_CAMERA_TIER
+        self.last_seen: Optional[float] = None
+        self.connects = 0
+
+        # Latest payloads from the node, sent to clients as they connect
+        self.status: Dict = {}
+        self.dataset: Optional[Dict] = None
+        self.data_point: Optional[Dict] = None
+        self.frames: Dict[str, Dict] = {}  # camera stream ID -> latest frame
+
+        # Metrics
+        labels = {'node': name}
+        REGISTRY.gauge(
+            'gateway_node_connected', 'Whether the upstream node connection is up', labels,
+            func=lambda: 1 if self.connected else 0)
+        self.received_counter = REGISTRY.counter(
+            'gateway_upstream_messages_total', 'Messages received from the node', labels)
+        self.relay_time = REGISTRY.histogram(
+            'gateway_relay_seconds', 'Time to cache and queue one upstream message', labels)
+        REGISTRY.gauge('gateway_downstream_clients', 'Clients connected to the node namespace', labels,
+                       func=self.subscriptions.client_count)
+
+        self.client = socketio_client.Client(reconnection=True, reconnection_delay_max=max_retry_delay,
+                                             handle_sigint=False)
+        self.client.on('connect', self._on_connect)
+        self.client.on('disconnect', self._on_disconnect)
+        for event in UPSTREAM_EVENTS:
+            self.client.on(event, self._make_relay(event))
+
+    def _upstream_url(self) -> str:
+        # Always take status and data; the camera tier follows downstream demand
+        return f"{self.url}?channels=status,data,camera:{self.camera_tier}"
+
+    def start(self, socketio):
+        """Connect to the node from a background task, retrying until it answers"""
+        if self.is_running:
+            return
+        self.is_running = True
+        socketio.start_background_task(self._connect_loop, socketio)
+
+    def _connect_loop(self, socketio):
+        """Initial connect with backoff; the client reconnects by itself afterwards"""
+        delay = 1.0
+        while self.is_running:
+            if self.startup is not None:
+                self.startup.mark(f"node:{self.name}", STARTING)
+            try:
+                self.client.connect(self._upstream_url(), wait_timeout=5)
+                return
+            except Exception as e:
+                logger.warning("Node %s at %s unreachable, retrying in %ss: %s", self.name, self.url, delay, e)
+                if self.startup is not None:
+                    self.startup.mark(f"node:{self.name}", UNAVAILABLE, str(e))
+            socketio.sleep(delay)
+            delay = min(delay * 2, self.max_retry_delay)
+
+    def stop(self):
+        """Disconnect from the node"""
+        self.is_running = False
+        try:
+            self.client.disconnect()
+        except Exception as e:
+            logger.error("Error disconnecting from node %s: %s", self.name, e)
+
+    def _on_connect(self):
+        self.connected = True
+        self.connects += 1
+        self.last_seen = time.monotonic()
+        if self.startup is not None:
+            self.startup.mark(f"node:{self.name}", READY)
+        logger.info("Connected to node %s at %s", self.name, self.url)
+        # A reconnect uses the original URL, so re-apply the current camera tier
+        self.update_camera_tier(force=True)
+        self.push_status()
+
+    def _on_disconnect(self, *args):
+        self.connected = False
+        if self.startup is not None:
+            self.startup.mark(f"node:{self.name}", UNAVAILABLE, 'Disconnected')
+        logger.warning("Lost connection to node %s", self.name)
+        # Cached status would otherwise keep showing the last state as current
+        self.push_status()
+
+    def _make_relay(self, event: str):
+        def relay(data):
+            start_time = time.perf_counter()
+            self.last_seen = time.monotonic()
+            self.received_counter.inc()
+            try:
+                self._relay(event, data)
+            except Exception as e:
+                logger.error("Error relaying %s from node %s: %s", event, self.name, e)
+            self.relay_time.observe(time.perf_counter() - start_time)
+        return relay
+
+    def _relay(self, event: str, data):
+        """Cache one upstream message and queue it for the due downstream rooms"""
+        channel = UPSTREAM_EVENTS[event]
+        if event == 'camera_frame':
+            # Nodes with several cameras send one stream per camera, each
+            # throttled on its own
+            camera = data.get('camera')
+            self.frames[camera] = data
+            for tier in self.subscriptions.due_tiers('camera', key=camera):
+                self.emit_queue.put('camera', 'camera_frame', dict(data, tier=tier),
+                                    to=room_name('camera', tier), namespace=self.namespace, key=camera)
+        elif event == 'new_data_point':
+            # Sent just before the matching full_dataset, which relays both
+            self.data_point = data
+        elif event == 'full_dataset':
+            self.dataset = data
+            for tier in self.subscriptions.due_tiers('data'):
+                room = room_name('data', tier)
+                if self.data_point is not None:
+                    self.emit_queue.put('data', 'new_data_point', self.data_point,
+                                        to=room, namespace=self.namespace)
+                self.emit_queue.put('data', 'full_dataset', data, to=room, namespace=self.namespace)
+        else:
+            with self.lock:
+                self.status.update(data)
+            if event == 'status_update':
+                # The node's first update can arrive before _on_connect runs,
+                # but a message from the node means it is connected
+                data = dict(data, node_connected=True)
+            # Status changes are event-driven, so every tier gets them
+            for tier in self.subscriptions.active_tiers(channel):
+                self.emit_queue.put('status', event, data, to=room_name('status', tier),
+                                    namespace=self.namespace)
+
+    def push_status(self):
+        """Send the cached status with the current connection state to every status room"""
+        status = self.get_status_update()
+        for tier in self.subscriptions.active_tiers('status'):
+            self.emit_queue.put('status', 'status_update', status, to=room_name('status', tier),
+                                namespace=self.namespace)
+
+    def update_camera_tier(self, force: bool = False):
+        """Ask the node for the best camera tier any downstream client wants"""
+        active = self.subscriptions.active_tiers('camera')
+        # RATE_TIERS is ordered best first
+        tier = active[0] if active else IDLE_CAMERA_TIER
+        if tier == self.camera_tier and not force:
+            return
+        self.camera_tier = tier
+        if self.connected:
+            self.client.emit('subscribe', {'channel': 'camera', 'tier': tier})
+            logger.info("Node %s camera tier set to %s", self.name, tier)
+
+    def forward(self, event: str, data=None):
+        """Send a client command to the node; dropped while disconnected"""
+        if not self.connected:
+            raise ConnectionError(f"Node '{self.name}' is not connected")
+        if data is None:
+            self.client.emit(event)
+        else:
+            self.client.emit(event, data)
+
+    def get_cached_status(self) -> Dict:
+        """Latest merged status from the node"""
+        with self.lock:
+            return dict(self.status)
+
+    def get_status_update(self) -> Dict:
+        """Cached status as a status_update payload, flagged with whether the node is connected"""
+        return dict(self.get_cached_status(), node_connected=self.connected)
+
+    def get_status(self):
+        """Get connection state, cache state and downstream subscriptions"""
+        return {
+            'url': self.url,
+            'namespace': self.namespace,
+            'connected': self.connected,
+            'connects': self.connects,
+            'last_seen_ago': round(time.monotonic() - self.last_seen, 3) if self.last_seen else None,
+            'camera_tier': self.camera_tier,
+            'cached': {
+                'status': bool(self.status),
+                'dataset': self.dataset is not None,
+                'frames': sorted(str(camera) for camera in self.frames)
+            },
+            'downstream': self.subscriptions.get_status()
+        }
+
+
+class NodeNamespace(Namespace):
+    """Downstream handlers for one node's namespace, mirroring the node's own events"""
+
+    def __init__(self, node: NodeClient):
+        super().__init__(node.namespace)
+        self.node = node
+
+    def on_connect(self):
+        node = self.node
+        logger.info("Client %s connected to %s", request.sid, node.namespace)
+        try:
+            node.subscriptions.add_client(request.sid)
+            requested = node.subscriptions.parse_channels(request.args.get('channels'))
+            for channel, tier in requested.items():
+                room, _ = node.subscriptions.subscribe(request.sid, channel, tier)
+                join_room(room)
+            node.update_camera_tier()
+
+            # Serve the cache straight away instead of waiting for the node
+            if 'status' in requested:
+                emit('status_update', node.get_status_update())
+            if 'data' in requested and node.dataset is not None:
+                emit('full_dataset', node.dataset)
+            if 'camera' in requested:
+                for frame in list(node.frames.values()):
+                    emit('camera_frame', dict(frame, tier=requested['camera']))
+        except Exception as e:
+            logger.error("Error during client connection handling: %s", e)
+
+    def on_disconnect(self, *args):
+        logger.info("Client %s disconnected from %s", request.sid, self.node.namespace)
+        try:
+            self.node.subscriptions.remove_client(request.sid)
+            self.node.update_camera_tier()
+        except Exception as e:
+            logger.error("Error during disconnect handling: %s", e)
+
+    def on_subscribe(self, data):
+        """Subscribe the client to a channel, e.g. {'channel': 'camera', 'tier': 'thumbnail'}"""
+        try:
+            room, old_room = self.node.subscriptions.subscribe(request.sid, data.get('channel'),
+                                                               data.get('tier', DEFAULT_TIER))
+            if old_room:
+                leave_room(old_room)
+            join_room(room)
+            self.node.update_camera_tier()
+            emit('subscriptions', self.node.subscriptions.client_subscriptions(request.sid))
+        except Exception as e:
+            logger.error("Error subscribing client: %s", e)
+            emit('subscription_error', {'error': str(e), 'tiers': list(RATE_TIERS)})
+
+    def on_unsubscribe(self, data):
+        """Unsubscribe the client from a channel, e.g. {'channel': 'camera'}"""
+        try:
+            room = self.node.subscriptions.unsubscribe(request.sid, data.get('channel'))
+            if room:
+                leave_room(room)
+            self.node.update_camera_tier()
+            emit('subscriptions', self.node.subscriptions.client_subscriptions(request.sid))
+        except Exception as e:
+            logger.error("Error unsubscribing client: %s", e)
+
+    def on_get_status(self):
+        emit('status_update', self.node.get_status_update())
+
+    def on_toggle_alarm(self):
+        self._forward('toggle_alarm')
+
+    def on_set_alarm_pattern(self, data):
+        """Change the node's siren pattern, e.g. {'pattern': 'pulse'}"""
+        self._forward('set_alarm_pattern', data)
+
+    def _forward(self, event, data=None):
+        # The node's status update comes back through the relay
+        try:
+            self.node.forward(event, data)
+        except Exception as e:
+            logger.error("Error forwarding %s to node %s: %s", event, self.node.name, e)
+            emit('alarm_error', {'error': str(e)})
+
+
+class Gateway:
+    def __init__(self, socketio, emit_queue, nodes: Dict[str, str], startup=None):
+        """
+        Aggregate several detector nodes behind one server
+
+        Each node gets one upstream connection and is re-served on its own
+        namespace (see node_namespace), with the same events and
+        subscription protocol as connecting to the node directly.
+
+        Args:
+            socketio: SocketIO instance to register the namespaces on
+            emit_queue: Shared EmitQueue for downstream emits
+            nodes (dict): Node name -> base URL, see parse_nodes()
+            startup: Optional StartupTracker; nodes are recorded as optional
+                components so one node being down does not fail readiness
+        """
+        self.socketio = socketio
+        self.nodes: Dict[str, NodeClient] = {}
+        for name, url in nodes.items():
+            if startup is not None:
+                startup.register(f"node:{name}", required=False)
+            node = NodeClient(name, url, emit_queue, startup=startup)
+            socketio.on_namespace(NodeNamespace(node))
+            self.nodes[name] = node
+        logger.info("Gateway configured for nodes: %s", ', '.join(nodes))
+
+    def start(self):
+        """Start connecting to every node"""
+        for node in self.nodes.values():
+            node.start(self.socketio)
+
+    def stop(self):
+        """Disconnect from every node"""
+        for node in self.nodes.values():
+            node.stop()
+
+    def get_nodes(self):
+        """Short per-node summary for dashboards picking a node"""
+        return {
+            name: {
+                'namespace': node.namespace,
+                'connected': node.connected,
+                'smoke_detected': node.get_cached_status().get('smoke_detected'),
+                'alarm_active': node.get_cached_status().get('alarm_active')
+            }
+            for name, node in self.nodes.items()
+        }
+
+    def get_status(self):
+        """Get per-node connection and cache state"""
+        return {name: node.get_status() for name, node in self.nodes.items()}
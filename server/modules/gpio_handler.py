@@ -1,9 +1,9 @@
 import logging
 import time
-import threading
 from collections import deque
 from statistics import mean, median
-from typing import Optional, List, Callable
+from typing import Optional
+from modules.metrics import REGISTRY
 
 try:
     import RPi.GPIO as GPIO
@@ -15,11 +15,10 @@ except ImportError:
 
 # Setup module logger
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
 
 class GPIOHandler:
     def __init__(self, 
-                 alarm_handler,
+                 event_bus,
                  smoke_detector_pin: int = 11,
                  sample_window: float = 1.0,  # 1 second sampling window
                  sample_rate: float = 0.02,   # 50Hz sampling rate
@@ -28,9 +27,9 @@ class GPIOHandler:
                  min_trigger_duration: float = 0.5  # Minimum smoke duration to trigger
                 ):
         self.smoke_detector_pin = smoke_detector_pin
-        self.alarm_handler = alarm_handler
-        self.callbacks: List[Callable] = []
+        self.event_bus = event_bus
         self.is_running = False
+        self.last_tick: Optional[float] = None
         
         # Sampling configuration
         self.sample_rate = sample_rate
@@ -46,17 +45,26 @@ class GPIOHandler:
         
         # State tracking
         self.current_state = False
-        self.last_state_change = time.time()
+        self.last_state_change = time.monotonic()
         self.state_change_cooldown = 1.0  # Minimum time between state changes
+
+        # Metrics
+        self.tick_jitter = REGISTRY.histogram(
+            'smoke_detection_tick_jitter_seconds',
+            'Deviation of detection loop tick intervals from the sample rate')
+        self.filter_duration = REGISTRY.histogram(
+            'smoke_filter_duration_seconds', 'Time spent in apply_filters')
+        self.sampling_errors = REGISTRY.counter(
+            'smoke_sampling_errors_total', 'Detection loop iterations that raised')
         
         # Log initialization
         if GPIO_AVAILABLE:
             logger.info("Initializing GPIOHandler with real GPIO")
-            logger.info(f"GPIO Version: {GPIO.VERSION}")
+            logger.info("GPIO Version: %s", GPIO.VERSION)
         else:
             logger.warning("Initializing GPIOHandler with mock GPIO")
             
-        logger.info(f"Initializing smoke detector on pin {smoke_detector_pin}")
+        logger.info("Initializing smoke detector on pin %s", smoke_detector_pin)
         self.setup_gpio()
         
     def setup_gpio(self):
@@ -66,10 +74,10 @@ class GPIOHandler:
             logger.info("GPIO mode set to BCM")
             
             GPIO.setup(self.smoke_detector_pin, GPIO.IN)
-            logger.info(f"Successfully configured GPIO pin {self.smoke_detector_pin} as INPUT")
+            logger.info("Successfully configured GPIO pin %s as INPUT", self.smoke_detector_pin)
             
         except Exception as e:
-            logger.error(f"Error setting up GPIO pin {self.smoke_detector_pin}: {str(e)}")
+            logger.error("Error setting up GPIO pin %s: %s", self.smoke_detector_pin, e)
             logger.exception("GPIO setup error details:")
             raise
         
@@ -98,7 +106,7 @@ class GPIOHandler:
         
     def check_smoke_state(self, filtered_value: float) -> bool:
         """Determine smoke state using hysteresis and minimum duration"""
-        current_time = time.time()
+        current_time = time.monotonic()
         
         # Initialize trigger timer if we cross upper threshold
         if filtered_value >= self.trigger_threshold and self.trigger_start_time is None:
@@ -117,63 +125,66 @@ class GPIOHandler:
             
         return self.current_state
         
-    def _continuous_detection(self):
-        """Improved continuous sampling with better noise handling"""
-        while self.is_running:
-            try:
-                # Read current value
-                current_reading = GPIO.input(self.smoke_detector_pin)
-                self.voltage_buffer.append(current_reading)
+    def _sample(self):
+        """Take one sample and update the smoke state; run by the scheduler"""
+        tick = time.perf_counter()
+        if self.last_tick is not None:
+            self.tick_jitter.observe(abs(tick - self.last_tick - self.sample_rate))
+        self.last_tick = tick
+        try:
+            # Read current value
+            current_reading = GPIO.input(self.smoke_detector_pin)
+            self.voltage_buffer.append(current_reading)
+            
+            # Only process if we have enough samples
+            if len(self.voltage_buffer) >= self.voltage_buffer.maxlen:
+                # Apply filtering
+                filter_start = time.perf_counter()
+                filtered_value = self.apply_filters(self.voltage_buffer)
+                self.filter_duration.observe(time.perf_counter() - filter_start)
+                self.filtered_buffer.append(filtered_value)
+                self.event_bus.publish('filtered_value', filtered_value)
                 
-                # Only process if we have enough samples
-                if len(self.voltage_buffer) >= self.voltage_buffer.maxlen:
-                    # Apply filtering
-                    filtered_value = self.apply_filters(self.voltage_buffer)
-                    self.filtered_buffer.append(filtered_value)
+                # Determine smoke state
+                new_state = self.check_smoke_state(filtered_value)
+                
+                # Handle state changes with cooldown
+                current_time = time.monotonic()
+                if (new_state != self.current_state and 
+                    current_time - self.last_state_change >= self.state_change_cooldown):
                     
-                    # Determine smoke state
-                    new_state = self.check_smoke_state(filtered_value)
+                    self.current_state = new_state
+                    self.last_state_change = current_time
                     
-                    # Handle state changes with cooldown
-                    current_time = time.time()
-                    if (new_state != self.current_state and 
-                        current_time - self.last_state_change >= self.state_change_cooldown):
-                        
-                        self.current_state = new_state
-                        self.last_state_change = current_time
-                        
-                        # Handle alarm control
-                        if new_state:
-                            self.alarm_handler.activate()
-                        else:
-                            self.alarm_handler.deactivate()
-                            
-                        # Notify callbacks
-                        for callback in self.callbacks:
-                            try:
-                                callback(new_state)
-                            except Exception as e:
-                                logger.error(f"Callback error: {str(e)}")
-                
-                time.sleep(self.sample_rate)
-                
-            except Exception as e:
-                logger.error(f"Sampling error: {str(e)}")
-                time.sleep(1)
+                    # Notify subscribers (alarm, recorder, clients)
+                    self.event_bus.publish('smoke_state', {
+                        'smoke_detected': new_state,
+                        'filtered_value': filtered_value
+                    })
+            return True
+            
+        except Exception as e:
+            # Returning False makes the scheduler back off before retrying
+            self.sampling_errors.inc()
+            logger.error("Sampling error: %s", e)
+            self.last_tick = None
+            return False
                 
-    def start_detection(self):
-        """Start the detection thread"""
+    def start_detection(self, scheduler):
+        """Register sampling as a periodic scheduler job"""
+        if self.is_running:
+            return
         self.is_running = True
-        self.detection_thread = threading.Thread(target=self._continuous_detection)
-        self.detection_thread.daemon = True
-        self.detection_thread.start()
+        self.scheduler = scheduler
+        self.last_tick = None
+        scheduler.add_job('smoke_detection', self._sample, self.sample_rate, max_backoff=1.0)
         logger.info("Smoke detection started")
         
     def stop_detection(self):
-        """Stop the detection thread"""
+        """Remove the sampling job"""
         self.is_running = False
-        if hasattr(self, 'detection_thread'):
-            self.detection_thread.join()
+        if hasattr(self, 'scheduler'):
+            self.scheduler.remove_job('smoke_detection')
         logger.info("Smoke detection stopped")
             
     def get_status(self):
@@ -183,7 +194,7 @@ class GPIOHandler:
             'filtered_value': self.filtered_buffer[-1] if self.filtered_buffer else 0.0,
             'raw_readings': list(self.voltage_buffer)
         }
-        logger.debug(f"Current detector status: {status}")
+        logger.debug("Current detector status: %s", status, extra={'rate_limit': True})
         return status
         
     def cleanup(self):
@@ -191,6 +202,6 @@ class GPIOHandler:
         self.stop_detection()
         try:
             GPIO.cleanup([self.smoke_detector_pin])
-            logger.info(f"GPIO cleanup completed for smoke detector pin {self.smoke_detector_pin}")
+            logger.info("GPIO cleanup completed for smoke detector pin %s", self.smoke_detector_pin)
         except Exception as e:
-            logger.error(f"Error during GPIO cleanup: {str(e)}")
\ No newline at end of file
+            logger.error("Error during GPIO cleanup: %s", e)
\ No newline at end of file
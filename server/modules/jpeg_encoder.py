@@ -0,0 +1,193 @@
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import List
+
+import cv2
+
+# Setup module logger
+logger = logging.getLogger(__name__)
+
+# Pixel layouts an encoder accepts. 'yuv420' is planar I420 as produced by
+# cv2.COLOR_BGR2YUV_I420: a (height * 3 / 2, width) array with the Y plane
+# followed by the quarter-size U and V planes.
+COLOR_MODES = ('bgr', 'gray', 'yuv420')
+
+# Backends tried in order by 'auto'; the libjpeg-turbo bindings come first
+AUTO_ORDER = ('simplejpeg', 'turbojpeg', 'opencv')
+
+
+def converted_shape(shape, color_mode: str):
+    """Array shape of a BGR frame of the given shape after convert_color()"""
+    height, width = shape[:2]
+    if color_mode == 'bgr':
+        return (height, width, 3)
+    if color_mode == 'gray':
+        return (height, width)
+    if color_mode == 'yuv420':
+        return (height * 3 // 2, width)
+    raise ValueError(f"Unknown color mode '{color_mode}'")
+
+
+def convert_color(frame, color_mode: str, dst=None):
+    """
+    Convert a BGR frame to the layout an encoder should take it in
+
+    Args:
+        frame: BGR uint8 array
+        color_mode (str): One of COLOR_MODES
+        dst: Optional preallocated output of converted_shape(), reused
+            instead of allocating a new array
+    """
+    if color_mode == 'bgr':
+        return frame
+    if color_mode == 'gray':
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=dst)
+    if color_mode == 'yuv420':
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2YUV_I420, dst=dst)
+    raise ValueError(f"Unknown color mode '{color_mode}'")
+
+
+def yuv420_planes(image):
+    """Split an I420 image into views of its Y, U and V planes"""
+    height = image.shape[0] * 2 // 3
+    width = image.shape[1]
+    flat = image.reshape(-1)
+    y_size = height * width
+    c_size = y_size // 4
+    y = flat[:y_size].reshape(height, width)
+    u = flat[y_size:y_size + c_size].reshape(height // 2, width // 2)
+    v = flat[y_size + c_size:y_size + 2 * c_size].reshape(height // 2, width // 2)
+    return y, u, v
+
+
+class JpegEncoder(ABC):
+    """Base class for JPEG encoder backends"""
+
+    name = None
+    # Color modes the backend encodes from directly
+    color_modes = COLOR_MODES
+
+    @abstractmethod
+    def encode(self, image, quality: int, color_mode: str = 'bgr'):
+        """
+        Encode an image to JPEG with 4:2:0 chroma subsampling (none for gray)
+
+        Args:
+            image: uint8 array in the given color mode
+            quality (int): JPEG quality, 1-100
+            color_mode (str): One of the backend's color_modes
+
+        Returns:
+            Bytes-like JPEG data
+        """
+
+
+class OpenCVEncoder(JpegEncoder):
+    """cv2.imencode; always available"""
+
+    name = 'opencv'
+    # imencode only takes BGR or gray; YUV input would have to be converted
+    # straight back to BGR, costing more than encoding BGR to begin with
+    color_modes = ('bgr', 'gray')
+
+    def encode(self, image, quality, color_mode='bgr'):
+        if color_mode not in self.color_modes:
+            raise ValueError(f"OpenCV encoder does not support color mode '{color_mode}'")
+        success, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not success:
+            raise RuntimeError("cv2.imencode failed")
+        return buffer
+
+
+class SimpleJpegEncoder(JpegEncoder):
+    """simplejpeg (bundled libjpeg-turbo); encodes YUV planes without color conversion"""
+
+    name = 'simplejpeg'
+
+    def __init__(self):
+        import simplejpeg
+        self.simplejpeg = simplejpeg
+
+    def encode(self, image, quality, color_mode='bgr'):
+        if color_mode == 'yuv420':
+            y, u, v = yuv420_planes(image)
+            return self.simplejpeg.encode_jpeg_yuv_planes(y, u, v, quality=quality, fastdct=True)
+        if color_mode == 'gray':
+            return self.simplejpeg.encode_jpeg(image[:, :, None], quality=quality, colorspace='GRAY',
+                                               fastdct=True)
+        return self.simplejpeg.encode_jpeg(image, quality=quality, colorspace='BGR',
+                                           colorsubsampling='420', fastdct=True)
+
+
+class TurboJpegEncoder(JpegEncoder):
+    """PyTurboJPEG; needs the system libturbojpeg"""
+
+    name = 'turbojpeg'
+
+    def __init__(self):
+        import turbojpeg
+        self.turbojpeg = turbojpeg
+        # Raises if the shared library cannot be found
+        self.jpeg = turbojpeg.TurboJPEG()
+
+    def encode(self, image, quality, color_mode='bgr'):
+        tj = self.turbojpeg
+        if color_mode == 'yuv420':
+            height = image.shape[0] * 2 // 3
+            return self.jpeg.encode_from_yuv(image, height, image.shape[1], quality=quality,
+                                             jpeg_subsample=tj.TJSAMP_420, flags=tj.TJFLAG_FASTDCT, align=1)
+        if color_mode == 'gray':
+            return self.jpeg.encode(image[:, :, None], quality=quality, pixel_format=tj.TJPF_GRAY,
+                                    jpeg_subsample=tj.TJSAMP_GRAY, flags=tj.TJFLAG_FASTDCT)
+        return self.jpeg.encode(image, quality=quality, pixel_format=tj.TJPF_BGR,
+                                jpeg_subsample=tj.TJSAMP_420, flags=tj.TJFLAG_FASTDCT)
+
+
+ENCODERS = {
+    'opencv': OpenCVEncoder,
+    'simplejpeg': SimpleJpegEncoder,
+    'turbojpeg': TurboJpegEncoder,
+}
+
+
+def create_encoder(name: str = None) -> JpegEncoder:
+    """
+    Create an encoder backend by name
+
+    Args:
+        name (str): A key of ENCODERS or 'auto', defaults to the JPEG_ENCODER
+            env var or 'auto', which picks the first backend in AUTO_ORDER
+            that loads
+
+    Raises:
+        ValueError: For an unknown name
+        ImportError, OSError: If a named backend cannot be loaded
+    """
+    name = (name or os.environ.get('JPEG_ENCODER', 'auto')).lower()
+    if name == 'auto':
+        for candidate in AUTO_ORDER:
+            try:
+                encoder = ENCODERS[candidate]()
+            except (ImportError, OSError, RuntimeError) as e:
+                logger.debug("JPEG encoder %s unavailable: %s", candidate, e)
+                continue
+            logger.info("Using %s JPEG encoder", candidate)
+            return encoder
+    if name not in ENCODERS:
+        raise ValueError(f"Unknown JPEG encoder '{name}', expected one of {', '.join(ENCODERS)} or auto")
+    encoder = ENCODERS[name]()
+    logger.info("Using %s JPEG encoder", name)
+    return encoder
+
+
+def available_encoders() -> List[str]:
+    """Names of the backends that load on this machine"""
+    available = []
+    for name, encoder_class in ENCODERS.items():
+        try:
+            encoder_class()
+        except (ImportError, OSError, RuntimeError):
+            continue
+        available.append(name)
+    return available
@@ -0,0 +1,194 @@
+import atexit
+import logging
+import os
+import _queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional, Tuple
+from modules.server_mode import native_thread_api
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s%(suppressed)s'
+
+
+class RateLimitFilter(logging.Filter):
+    def __init__(self, interval: float = 10.0):
+        """
+        Drop repeats of a message within an interval
+
+        Only records that can flood are limited, so lifecycle lines such as
+        startup timings always pass:
+
+        - WARNING and above are keyed on the formatted message, so a repeated
+          error is held back but the same error from another job or client
+          still shows up.
+        - Records logged with extra={'rate_limit': True}, meant for hot-path
+          lines whose arguments change every time, are keyed on the
+          unformatted template, so use lazy %-style arguments rather than
+          f-strings.
+        - Everything else, and anything logged with
+          extra={'rate_limit': False}, passes.
+
+        When a message is let through again, its suppressed count is
+        attached to the record and shows up in the formatted line.
+
+        Args:
+            interval (float): Minimum time between records of one key, in seconds
+        """
+        super().__init__()
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.last_seen: Dict[Tuple, float] = {}
+        self.suppressed: Dict[Tuple, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate_limit = getattr(record, 'rate_limit', None)
+        if rate_limit is False or (rate_limit is None and record.levelno < logging.WARNING):
+            record.suppressed = ''
+            return True
+
+        if rate_limit:
+            msg = record.msg if isinstance(record.msg, str) else repr(record.msg)
+        else:
+            try:
+                msg = record.getMessage()
+            except Exception:
+                msg = str(record.msg)
+        key = (record.name, record.levelno, msg)
+        now = time.monotonic()
+        with self.lock:
+            last = self.last_seen.get(key)
+            if last is not None and now - last < self.interval:
+                self.suppressed[key] = self.suppressed.get(key, 0) + 1
+                return False
+            self.last_seen[key] = now
+            count = self.suppressed.pop(key, 0)
+
+        record.suppressed = f" [{count} similar messages suppressed]" if count else ''
+        return True
+
+    def get_status(self):
+        """Number of records currently held back per message or template"""
+        with self.lock:
+            return {f"{name}:{msg}": count for (name, _, msg), count in self.suppressed.items()}
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread
+
+    The stock handler merges the message arguments in the calling thread.
+    Records stay in-process here, so the listener can do it instead; callers
+    must not mutate objects passed as log arguments afterwards.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class NativeQueueListener(QueueListener):
+    """
+    QueueListener whose thread is a native one even under eventlet or gevent,
+    since it blocks on the queue and on file I/O
+    """
+
+    def start(self):
+        start_new_thread, allocate_lock = native_thread_api()
+        self._done = allocate_lock()
+        self._done.acquire()
+
+        def run():
+            try:
+                self._monitor()
+            finally:
+                self._done.release()
+
+        start_new_thread(run, ())
+
+    def stop(self):
+        if getattr(self, '_done', None) is None:
+            return
+        self.enqueue_sentinel()
+        self._done.acquire(timeout=5.0)
+        self._done = None
+
+
+class _SuppressedDefault(logging.Filter):
+    """Make sure every record has the attribute LOG_FORMAT expects"""
+
+    def filter(self, record):
+        if not hasattr(record, 'suppressed'):
+            record.suppressed = ''
+        return True
+
+
+def parse_module_levels(spec: Optional[str]) -> Dict[str, int]:
+    """Parse "modules.camera=DEBUG,modules.gpio_handler=WARNING" into levels"""
+    levels = {}
+    for item in (spec or '').split(','):
+        name, _, level = item.strip().partition('=')
+        if name and level:
+            levels[name] = logging.getLevelName(level.strip().upper())
+    return levels
+
+
+def configure_logging(log_file: str = 'logs/smoke_detector.log',
+                      level: Optional[str] = None,
+                      module_levels: Optional[Dict[str, int]] = None,
+                      rate_limit_interval: float = 10.0):
+    """
+    Route all logging through a queue so file and console I/O run on one
+    listener thread instead of the thread that logged
+
+    Args:
+        log_file (str): Rotating log file path
+        level (str): Root level, defaults to the LOG_LEVEL env var or INFO
+        module_levels (dict): Logger name -> level, defaults to the LOG_LEVELS
+            env var, e.g. "modules.camera=DEBUG,modules.gpio_handler=WARNING"
+        rate_limit_interval (float): Seconds between repeats of one limited message
+
+    Returns:
+        The started QueueListener; it is also stopped at interpreter exit
+    """
+    os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = RotatingFileHandler(
+        log_file,
+        maxBytes=1024*1024,  # 1MB
+        backupCount=5
+    )
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+        handler.addFilter(_SuppressedDefault())
+
+    # The C queue is never monkey patched, so the native listener can block on it
+    log_queue = _queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(rate_limit_interval))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level or os.environ.get('LOG_LEVEL', 'INFO').upper())
+
+    if module_levels is None:
+        module_levels = parse_module_levels(os.environ.get('LOG_LEVELS'))
+    for name, module_level in module_levels.items():
+        logging.getLogger(name).setLevel(module_level)
+
+    listener = NativeQueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+def get_rate_limit_status():
+    """Suppressed counts from the root queue handler's rate limiter"""
+    for handler in logging.getLogger().handlers:
+        for log_filter in handler.filters:
+            if isinstance(log_filter, RateLimitFilter):
+                return log_filter.get_status()
+    return {}
@@ -0,0 +1,226 @@
+import gc
+import os
+import sys
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Default latency buckets in seconds, from 100us to 1s
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# Payload size buckets in bytes, from 1KB to 1MB
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+class Counter:
+    def __init__(self):
+        """
+        Monotonically increasing value
+
+        inc() takes no lock, so each counter should be fed from a single
+        thread (a lost increment under contention is acceptable for stats).
+        """
+        self.value = 0
+
+    def inc(self, amount=1):
+        """Add to the counter"""
+        self.value += amount
+
+
+class Gauge:
+    def __init__(self, func: Optional[Callable[[], float]] = None):
+        """
+        Value that can go up and down
+
+        Args:
+            func (callable): Optional function read at render time instead
+                of a stored value
+        """
+        self.func = func
+        self.value = 0.0
+
+    def set(self, value: float):
+        """Set the stored value"""
+        self.value = value
+
+    def get(self) -> float:
+        """Current value, from func if given"""
+        return self.func() if self.func is not None else self.value
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """
+        Cumulative histogram with fixed bucket upper bounds
+
+        observe() takes no lock, so each histogram should be fed from a
+        single thread; readers get a consistent-enough snapshot.
+
+        Args:
+            buckets (tuple): Sorted bucket upper bounds
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        """Record one observation"""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile as the upper bound of the bucket it falls in,
+        capped at the largest observation so it never exceeds the max
+        """
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def get_status(self):
+        """Get a summary suitable for JSON status payloads (times in ms)"""
+        return {
+            'count': self.count,
+            'mean_ms': round(self.sum / self.count * 1000, 3) if self.count else 0.0,
+            'p50_ms': round(self.quantile(0.5) * 1000, 3),
+            'p99_ms': round(self.quantile(0.99) * 1000, 3),
+            'max_ms': round(self.max * 1000, 3),
+            'buckets_ms': {
+                str(round(bound * 1000, 3)): count
+                for bound, count in zip(self.buckets, self.counts)
+            },
+            'overflow': self.counts[-1]
+        }
+
+
+def _format_labels(labels: Dict[str, str], extra: str = '') -> str:
+    parts = [f'{key}="{value}"' for key, value in sorted(labels.items())]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self):
+        """
+        Named metrics rendered in the Prometheus text exposition format
+
+        Registration is get-or-create: asking twice for the same name and
+        labels returns the same metric, so handlers can register in __init__.
+        """
+        self.lock = threading.Lock()
+        self.families: Dict[str, Dict] = {}  # name -> {'type', 'help', 'series': {labels: metric}}
+
+    def _get(self, kind: str, name: str, help_text: str, labels: Optional[Dict[str, str]], factory):
+        key = tuple(sorted((labels or {}).items()))
+        with self.lock:
+            family = self.families.setdefault(name, {'type': kind, 'help': help_text, 'series': {}})
+            if family['type'] != kind:
+                raise ValueError(f"Metric '{name}' already registered as a {family['type']}")
+            metric = family['series'].get(key)
+            if metric is None:
+                metric = factory()
+                family['series'][key] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, labels: Optional[Dict[str, str]] = None) -> Counter:
+        """Get or create a counter"""
+        return self._get('counter', name, help_text, labels, Counter)
+
+    def gauge(self, name: str, help_text: str, labels: Optional[Dict[str, str]] = None,
+              func: Optional[Callable[[], float]] = None) -> Gauge:
+        """Get or create a gauge, optionally backed by a function"""
+        gauge = self._get('gauge', name, help_text, labels, lambda: Gauge(func))
+        if func is not None:
+            gauge.func = func
+        return gauge
+
+    def histogram(self, name: str, help_text: str, labels: Optional[Dict[str, str]] = None,
+                  buckets=LATENCY_BUCKETS) -> Histogram:
+        """Get or create a histogram"""
+        return self._get('histogram', name, help_text, labels, lambda: Histogram(buckets))
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text format"""
+        with self.lock:
+            families = [(name, dict(family, series=dict(family['series'])))
+                        for name, family in sorted(self.families.items())]
+
+        lines = []
+        for name, family in families:
+            lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['type']}")
+            for key, metric in family['series'].items():
+                labels = dict(key)
+                if family['type'] == 'histogram':
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets, metric.counts):
+                        cumulative += count
+                        bucket_labels = _format_labels(labels, 'le="%s"' % bound)
+                        lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                    bucket_labels = _format_labels(labels, 'le="+Inf"')
+                    lines.append(f"{name}_bucket{bucket_labels} {metric.count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(metric.sum)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {metric.count}")
+                elif family['type'] == 'gauge':
+                    try:
+                        value = metric.get()
+                    except Exception:
+                        continue
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(metric.value)}")
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry served at /metrics
+REGISTRY = Registry()
+
+
+def _resident_memory_bytes() -> int:
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def _peak_resident_memory_bytes() -> int:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def register_process_metrics(registry: Registry = REGISTRY):
+    """
+    Add memory and allocation gauges for this process
+
+    Gauges whose source is missing on this platform are skipped at render time.
+    """
+    registry.gauge('process_resident_memory_bytes', 'Current resident set size',
+                   func=_resident_memory_bytes)
+    if resource is not None:
+        registry.gauge('process_peak_resident_memory_bytes', 'Peak resident set size since start',
+                       func=_peak_resident_memory_bytes)
+    registry.gauge('python_allocated_blocks', 'Memory blocks currently allocated by the interpreter',
+                   func=sys.getallocatedblocks)
+    for generation in range(len(gc.get_stats())):
+        registry.gauge('python_gc_collections', 'Garbage collections run per generation',
+                       labels={'generation': str(generation)},
+                       func=lambda generation=generation: gc.get_stats()[generation]['collections'])
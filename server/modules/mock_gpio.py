@@ -1,3 +1,8 @@
+import logging
+
+# Setup module logger; calls are logged at DEBUG since input() runs at 50Hz
+logger = logging.getLogger(__name__)
+
 class GPIO:
     """Mock GPIO class for development environments"""
     BCM = 'BCM'
@@ -12,27 +17,25 @@ class GPIO:
 
     @staticmethod
     def setmode(mode):
-        print(f"GPIO.setmode({mode})")
+        logger.debug("GPIO.setmode(%s)", mode)
 
     @staticmethod
     def setup(pin, mode, pull_up_down=None):
-        pull_up_down_str = f", pull_up_down={pull_up_down}" if pull_up_down else ""
-        print(f"GPIO.setup({pin}, {mode}{pull_up_down_str})")
+        logger.debug("GPIO.setup(%s, %s, pull_up_down=%s)", pin, mode, pull_up_down)
 
     @staticmethod
     def output(pin, value):
-        print(f"GPIO.output({pin}, {value})")
+        logger.debug("GPIO.output(%s, %s)", pin, value)
 
     @staticmethod
     def input(pin):
-        print(f"GPIO.input({pin})")
+        logger.debug("GPIO.input(%s)", pin)
         return 0  # Mock return value
 
     @staticmethod
     def add_event_detect(pin, edge, callback=None, bouncetime=None):
-        print(f"GPIO.add_event_detect({pin}, {edge}, callback={callback.__name__}, bouncetime={bouncetime})")
+        logger.debug("GPIO.add_event_detect(%s, %s, callback=%s, bouncetime=%s)", pin, edge, callback, bouncetime)
 
     @staticmethod
     def cleanup(pins=None):
-        pins_str = str(pins) if pins else "all pins"
-        print(f"GPIO.cleanup({pins_str})")
\ No newline at end of file
+        logger.debug("GPIO.cleanup(%s)", pins if pins else "all pins")
\ No newline at end of file
@@ -0,0 +1,204 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, Dict, List
+
+from modules.metrics import REGISTRY
+
+# Setup module logger
+logger = logging.getLogger(__name__)
+
+
+class PeriodicJob:
+    def __init__(self, name: str, func: Callable, interval: float, max_backoff: float):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.next_run = 0.0
+        self.failures = 0
+        self.runs = 0
+        self.missed = 0
+        self.running = False
+        self.cancelled = False
+
+        # Metrics
+        labels = {'job': name}
+        self.lateness = REGISTRY.histogram(
+            'scheduler_job_lateness_seconds', 'How late a job started after its deadline', labels)
+        self.duration = REGISTRY.histogram(
+            'scheduler_job_duration_seconds', 'Job run time', labels)
+        self.missed_counter = REGISTRY.counter(
+            'scheduler_missed_deadlines_total', 'Deadlines skipped because a run overran', labels)
+        self.failure_counter = REGISTRY.counter(
+            'scheduler_job_failures_total', 'Runs that raised or returned False', labels)
+
+    def get_status(self):
+        """Get run counters for this job"""
+        return {
+            'interval': self.interval,
+            'runs': self.runs,
+            'missed_deadlines': self.missed,
+            'consecutive_failures': self.failures,
+            'lateness': self.lateness.get_status(),
+            'duration': self.duration.get_status()
+        }
+
+
+class Scheduler:
+    def __init__(self, workers: int = 2):
+        """
+        Run periodic jobs on time.monotonic() deadlines from a small worker pool
+
+        Deadlines advance by a fixed interval so jobs do not drift. A run
+        that overruns skips the deadlines it missed (counted, not replayed).
+        A job that raises, or returns False, is retried with exponential
+        backoff up to its max_backoff. A job never runs concurrently with
+        itself; different jobs can run in parallel on different workers.
+
+        Args:
+            workers (int): Number of worker tasks
+        """
+        self.workers = workers
+        self.condition = threading.Condition()
+        self.heap: List = []  # (next_run, sequence, job)
+        self.jobs: Dict[str, PeriodicJob] = {}
+        self.sequence = itertools.count()
+        self.is_running = False
+
+    def add_job(self, name: str, func: Callable, interval: float,
+                start_delay: float = 0.0, max_backoff: float = 30.0) -> PeriodicJob:
+        """
+        Register a periodic job, replacing any job with the same name
+
+        Args:
+            name (str): Unique job name, also used as the metrics label
+            func (callable): Called with no arguments every interval
+            interval (float): Seconds between deadlines
+            start_delay (float): Seconds before the first run
+            max_backoff (float): Upper bound for the retry delay after failures
+        """
+        self.remove_job(name)
+        job = PeriodicJob(name, func, interval, max_backoff)
+        job.next_run = time.monotonic() + start_delay
+        with self.condition:
+            self.jobs[name] = job
+            heapq.heappush(self.heap, (job.next_run, next(self.sequence), job))
+            self.condition.notify()
+        logger.info("Scheduled job %s every %ss", name, interval)
+        return job
+
+    def remove_job(self, name: str, wait: bool = True, timeout: float = 5.0):
+        """
+        Cancel a job; optionally wait for an in-flight run to finish
+
+        Waiting from inside the job itself would deadlock, so jobs must pass
+        wait=False when removing themselves.
+        """
+        with self.condition:
+            job = self.jobs.pop(name, None)
+            if job is None:
+                return
+            job.cancelled = True
+            deadline = time.monotonic() + timeout
+            while wait and job.running and time.monotonic() < deadline:
+                self.condition.wait(deadline - time.monotonic())
+        logger.info("Removed job %s", name)
+
+    def has_job(self, name: str) -> bool:
+        """Check whether a job is registered"""
+        with self.condition:
+            return name in self.jobs
+
+    def start(self, socketio):
+        """Start the worker pool as Socket.IO background tasks"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self.socketio = socketio
+        for _ in range(self.workers):
+            socketio.start_background_task(self._worker)
+        logger.info("Scheduler started with %s workers", self.workers)
+
+    def add_workers(self, count: int):
+        """
+        Grow the worker pool, e.g. by one per job that blocks on I/O such as
+        a camera read, so those jobs cannot delay the others
+        """
+        self.workers += count
+        if self.is_running:
+            for _ in range(count):
+                self.socketio.start_background_task(self._worker)
+        logger.info("Scheduler grown to %s workers", self.workers)
+
+    def stop(self):
+        """Stop all workers after their current run"""
+        with self.condition:
+            self.is_running = False
+            self.condition.notify_all()
+
+    def _next_due_job(self):
+        """Wait for the earliest deadline and claim that job"""
+        with self.condition:
+            while self.is_running:
+                if not self.heap:
+                    self.condition.wait()
+                    continue
+                next_run, _, job = self.heap[0]
+                if job.cancelled:
+                    heapq.heappop(self.heap)
+                    continue
+                now = time.monotonic()
+                if next_run > now:
+                    self.condition.wait(next_run - now)
+                    continue
+                heapq.heappop(self.heap)
+                job.running = True
+                return job, now
+            return None, None
+
+    def _run_job(self, job: PeriodicJob, started: float):
+        job.lateness.observe(started - job.next_run)
+        try:
+            succeeded = job.func() is not False
+        except Exception as e:
+            logger.error("Job %s failed: %s", job.name, e)
+            succeeded = False
+        finished = time.monotonic()
+        job.duration.observe(finished - started)
+        job.runs += 1
+
+        if succeeded:
+            job.failures = 0
+            job.next_run += job.interval
+            # Skip deadlines that passed while the job was running
+            if job.next_run <= finished:
+                missed = int((finished - job.next_run) // job.interval) + 1
+                job.missed += missed
+                job.missed_counter.inc(missed)
+                job.next_run += missed * job.interval
+        else:
+            job.failures += 1
+            job.failure_counter.inc()
+            backoff = min(job.interval * 2 ** job.failures, job.max_backoff)
+            job.next_run = finished + max(backoff, job.interval)
+
+    def _worker(self):
+        while self.is_running:
+            job, started = self._next_due_job()
+            if job is None:
+                return
+            self._run_job(job, started)
+            with self.condition:
+                job.running = False
+                if not job.cancelled:
+                    heapq.heappush(self.heap, (job.next_run, next(self.sequence), job))
+                self.condition.notify_all()
+
+    def get_status(self):
+        """Get per-job counters"""
+        with self.condition:
+            jobs = list(self.jobs.values())
+        return {job.name: job.get_status() for job in jobs}
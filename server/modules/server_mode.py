@@ -0,0 +1,79 @@
+import os
+
+# 'development' runs the Werkzeug debug server, 'production' runs on an async
+# worker (eventlet, else gevent) without the debug reloader.
+SERVER_MODE = os.environ.get('SERVER_MODE', 'development').lower()
+ASYNC_MODE = 'threading'
+
+# Listening port; set it to run several nodes (or a gateway) on one machine
+PORT = int(os.environ.get('PORT', '5000'))
+
+
+def setup():
+    """
+    Pick the async worker for the current server mode and monkey patch it
+
+    Must be called before anything else imports threading, socket or time,
+    so app.py calls it first thing.
+
+    Returns:
+        The async_mode to pass to SocketIO
+    """
+    global ASYNC_MODE
+    if SERVER_MODE != 'production':
+        ASYNC_MODE = 'threading'
+        return ASYNC_MODE
+
+    try:
+        import eventlet
+        eventlet.monkey_patch()
+        ASYNC_MODE = 'eventlet'
+    except ImportError:
+        try:
+            from gevent import monkey
+            monkey.patch_all()
+            ASYNC_MODE = 'gevent'
+        except ImportError:
+            print("Neither eventlet nor gevent is installed - falling back to threading")
+            ASYNC_MODE = 'threading'
+    return ASYNC_MODE
+
+
+def is_production() -> bool:
+    """Check whether the server runs in production mode"""
+    return SERVER_MODE == 'production'
+
+
+def run_blocking(func, *args, **kwargs):
+    """
+    Run a blocking call (camera reads, JPEG encodes) without stalling the hub
+
+    Under eventlet or gevent the call is handed to a native thread pool so
+    other green threads keep running; in threading mode it runs inline.
+    """
+    if ASYNC_MODE == 'eventlet':
+        from eventlet import tpool
+        return tpool.execute(func, *args, **kwargs)
+    if ASYNC_MODE == 'gevent':
+        import gevent
+        return gevent.get_hub().threadpool.apply(func, args, kwargs)
+    return func(*args, **kwargs)
+
+
+def native_thread_api():
+    """
+    Unpatched thread primitives for work that must not share the async hub
+
+    Returns:
+        Tuple (start_new_thread, allocate_lock) from the original _thread module
+    """
+    if ASYNC_MODE == 'eventlet':
+        from eventlet import patcher
+        original = patcher.original('_thread')
+        return original.start_new_thread, original.allocate_lock
+    if ASYNC_MODE == 'gevent':
+        from gevent import monkey
+        return (monkey.get_original('_thread', 'start_new_thread'),
+                monkey.get_original('_thread', 'allocate_lock'))
+    import _thread
+    return _thread.start_new_thread, _thread.allocate_lock
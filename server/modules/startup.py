@@ -0,0 +1,97 @@
+import logging
+import threading
+import time
+from typing import Dict
+
+# Setup module logger
+logger = logging.getLogger(__name__)
+
+# Component states
+PENDING = 'pending'
+STARTING = 'starting'
+READY = 'ready'
+UNAVAILABLE = 'unavailable'  # Loaded fine but the hardware is missing
+FAILED = 'failed'
+
+
+class StartupTracker:
+    def __init__(self):
+        """
+        Record per-component startup state and timings for /healthz and /readyz
+
+        Times are seconds since the tracker was created, which app.py does
+        as early as possible.
+        """
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.components: Dict[str, Dict] = {}
+
+    def register(self, name: str, required: bool = True):
+        """
+        Declare a component up front so it shows as pending until started
+
+        Args:
+            name (str): Component name
+            required (bool): Whether the service is not ready without it
+        """
+        with self.lock:
+            self.components[name] = {
+                'state': PENDING,
+                'required': required,
+                'started_at': None,
+                'ready_at': None,
+                'duration': None,
+                'error': None
+            }
+
+    def _elapsed(self) -> float:
+        return round(time.monotonic() - self.started, 3)
+
+    def mark(self, name: str, state: str, error: str = None):
+        """Move a component to a new state, recording the time"""
+        with self.lock:
+            component = self.components.setdefault(name, {'required': True, 'started_at': None,
+                                                          'ready_at': None, 'duration': None})
+            component['state'] = state
+            component['error'] = error
+            if state == STARTING:
+                component['started_at'] = self._elapsed()
+            elif state != PENDING:
+                component['ready_at'] = self._elapsed()
+                if component['started_at'] is not None:
+                    component['duration'] = round(component['ready_at'] - component['started_at'], 3)
+
+    def run(self, name: str, func, *args, **kwargs):
+        """
+        Start a component through func, recording timing and failures
+
+        Returns:
+            Whatever func returns; exceptions are recorded and re-raised
+        """
+        self.mark(name, STARTING)
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.mark(name, FAILED, str(e))
+            logger.error("Component %s failed to start: %s", name, e)
+            raise
+        self.mark(name, READY)
+        logger.info("Component %s ready after %ss", name, self.components[name]['duration'])
+        return result
+
+    def is_ready(self) -> bool:
+        """All required components are ready"""
+        with self.lock:
+            return all(component['state'] == READY
+                       for component in self.components.values() if component['required'])
+
+    def get_status(self):
+        """Get readiness plus per-component state and timings"""
+        with self.lock:
+            components = {name: dict(component) for name, component in self.components.items()}
+        return {
+            'ready': all(component['state'] == READY
+                         for component in components.values() if component['required']),
+            'uptime': self._elapsed(),
+            'components': components
+        }
@@ -0,0 +1,157 @@
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Setup module logger
+logger = logging.getLogger(__name__)
+
+# Channels a client can subscribe to
+CHANNELS = ('camera', 'data', 'status')
+
+# Rate tiers shared by all channels. 'min_interval' throttles how often a room
+# receives its channel, 'scale' and 'jpeg_quality' only apply to camera frames.
+RATE_TIERS = {
+    'full': {'min_interval': 0.0, 'scale': 1.0, 'jpeg_quality': 80},
+    'thumbnail': {'min_interval': 1.0, 'scale': 0.25, 'jpeg_quality': 60},
+}
+DEFAULT_TIER = 'full'
+
+
+def room_name(channel: str, tier: str) -> str:
+    """Socket.IO room used for a channel at a given rate tier"""
+    return f"{channel}:{tier}"
+
+
+class SubscriptionManager:
+    def __init__(self, default_channels=CHANNELS):
+        """
+        Track which clients are subscribed to which channel and rate tier
+
+        Args:
+            default_channels (tuple): Channels a client joins at the default
+                tier when it does not ask for specific ones on connect
+        """
+        self.default_channels = tuple(default_channels)
+        self.lock = threading.Lock()
+        self.clients: Dict[str, Dict[str, str]] = {}  # sid -> {channel: tier}
+        self.last_emit: Dict[tuple, float] = {}  # (room, key) -> last delivery time
+
+    def parse_channels(self, spec: Optional[str]) -> Dict[str, str]:
+        """
+        Parse a subscription spec such as "camera:thumbnail,status"
+
+        Unknown channels or tiers are ignored. An empty spec yields the
+        default channels at the default tier.
+        """
+        if not spec:
+            return {channel: DEFAULT_TIER for channel in self.default_channels}
+
+        subscriptions = {}
+        for item in spec.split(','):
+            channel, _, tier = item.strip().partition(':')
+            tier = tier or DEFAULT_TIER
+            if channel in CHANNELS and tier in RATE_TIERS:
+                subscriptions[channel] = tier
+            else:
+                logger.warning("Ignoring invalid subscription '%s'", item)
+        return subscriptions
+
+    def subscribe(self, sid: str, channel: str, tier: str = DEFAULT_TIER):
+        """
+        Subscribe a client to a channel, replacing any previous tier
+
+        Returns:
+            Tuple (new_room, old_room); old_room is None if there was none
+        """
+        if channel not in CHANNELS:
+            raise ValueError(f"Unknown channel '{channel}'")
+        if tier not in RATE_TIERS:
+            raise ValueError(f"Unknown rate tier '{tier}'")
+
+        with self.lock:
+            channels = self.clients.setdefault(sid, {})
+            old_tier = channels.get(channel)
+            channels[channel] = tier
+
+        old_room = room_name(channel, old_tier) if old_tier and old_tier != tier else None
+        logger.info("Client %s subscribed to %s at %s tier", sid, channel, tier)
+        return room_name(channel, tier), old_room
+
+    def unsubscribe(self, sid: str, channel: str) -> Optional[str]:
+        """Unsubscribe a client from a channel, returning the room it left"""
+        with self.lock:
+            tier = self.clients.get(sid, {}).pop(channel, None)
+
+        if tier is None:
+            return None
+        logger.info("Client %s unsubscribed from %s", sid, channel)
+        return room_name(channel, tier)
+
+    def add_client(self, sid: str):
+        """Register a connected client with no subscriptions yet"""
+        with self.lock:
+            self.clients.setdefault(sid, {})
+
+    def remove_client(self, sid: str) -> List[str]:
+        """Forget a disconnected client, returning the rooms it was in"""
+        with self.lock:
+            channels = self.clients.pop(sid, {})
+        return [room_name(channel, tier) for channel, tier in channels.items()]
+
+    def client_subscriptions(self, sid: str) -> Dict[str, str]:
+        """Get a copy of a client's channel -> tier mapping"""
+        with self.lock:
+            return dict(self.clients.get(sid, {}))
+
+    def client_count(self) -> int:
+        """Number of connected clients"""
+        with self.lock:
+            return len(self.clients)
+
+    def active_tiers(self, channel: str) -> List[str]:
+        """Tiers of a channel that currently have at least one subscriber"""
+        with self.lock:
+            tiers = {channels[channel] for channels in self.clients.values() if channel in channels}
+        return [tier for tier in RATE_TIERS if tier in tiers]
+
+    def has_subscribers(self, channel: str) -> bool:
+        """Check whether anyone is subscribed to a channel at any tier"""
+        return bool(self.active_tiers(channel))
+
+    def due_tiers(self, channel: str, now: Optional[float] = None, key: Optional[str] = None) -> List[str]:
+        """
+        Tiers of a channel that have subscribers and are due for delivery
+
+        Returned tiers are marked as delivered, so callers should emit to
+        every room they get back.
+
+        Args:
+            channel (str): Channel name
+            now (float): time.monotonic() value, defaults to now
+            key (str): Separate source within the channel (e.g. a camera
+                stream ID) that is throttled independently of the others
+        """
+        now = time.monotonic() if now is None else now
+        due = []
+        for tier in self.active_tiers(channel):
+            last_key = (room_name(channel, tier), key)
+            with self.lock:
+                last = self.last_emit.get(last_key)
+                if last is None or now - last >= RATE_TIERS[tier]['min_interval']:
+                    self.last_emit[last_key] = now
+                    due.append(tier)
+        return due
+
+    def get_status(self):
+        """Get subscriber counts per room"""
+        with self.lock:
+            rooms: Dict[str, int] = {}
+            for channels in self.clients.values():
+                for channel, tier in channels.items():
+                    room = room_name(channel, tier)
+                    rooms[room] = rooms.get(room, 0) + 1
+            return {
+                'clients': len(self.clients),
+                'rooms': rooms
+            }